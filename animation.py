@@ -0,0 +1,198 @@
+# animation.py
+#
+# Message animations played from one ticker task. An animation is a message
+# plus a list of Frames (delay since the previous frame, then the message.edit
+# arguments); the ticker keeps a heap of when each animation's next frame is
+# due instead of one sleeping coroutine per command.
+#
+# A frame identical to what's already on screen is skipped. If an edit is
+# still in flight when later frames come due (slow API, 429 backoff), the
+# frames in between are dropped and the newest due frame is shown; the last
+# frame of an animation is never dropped.
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Any, Dict, List, Optional, Sequence
+
+import discord
+
+logger = logging.getLogger("TeamRocketBot")
+
+
+class Frame:
+    __slots__ = ("delay", "kwargs")
+
+    def __init__(self, delay: float, **kwargs):
+        self.delay = delay
+        self.kwargs = kwargs
+
+    def fingerprint(self):
+        parts = []
+        for key, value in sorted(self.kwargs.items()):
+            if isinstance(value, discord.Embed):
+                value = repr(value.to_dict())
+            elif isinstance(value, (list, tuple)):
+                value = tuple(getattr(item, "filename", None) or id(item) for item in value)
+            elif isinstance(value, discord.ui.View):
+                value = tuple(getattr(item, "custom_id", None) for item in value.children)
+            parts.append((key, value))
+        return tuple(parts)
+
+    def close(self):
+        """Release files of a frame that won't be sent."""
+        for value in self.kwargs.values():
+            for item in value if isinstance(value, (list, tuple)) else (value,):
+                if isinstance(item, discord.File):
+                    item.close()
+
+
+class Animation:
+    __slots__ = ("message", "frames", "due", "index", "shown", "editing", "finished")
+
+    def __init__(self, message: discord.Message, frames: Sequence[Frame], start: float):
+        self.message = message
+        self.frames = list(frames)
+        self.due: List[float] = list(itertools.accumulate((frame.delay for frame in self.frames), initial=start))[1:]
+        self.index = 0  # next frame to show
+        self.shown = None  # fingerprint of the frame on screen
+        self.editing = False
+        self.finished: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def done(self) -> bool:
+        return self.finished.done()
+
+    async def wait(self) -> bool:
+        """Wait until the animation ends. True if every frame played, False if it was cancelled."""
+        return await asyncio.shield(self.finished)
+
+
+class AnimationEngine:
+
+    def __init__(self):
+        self._heap: List[tuple] = []  # (due, seq, animation)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self.active: Dict[int, Animation] = {}  # message id -> animation
+        self.stats = {"played": 0, "frames": 0, "unchanged": 0, "dropped": 0, "cancelled": 0}
+
+    def play(self, message: discord.Message, frames: Sequence[Frame], *, initial: Optional[Frame] = None) -> Animation:
+        """
+        Start animating `message`, replacing any animation already running on
+        it. `initial` describes what the message shows now, so a first frame
+        that matches it is skipped.
+        """
+        self.cancel(message.id)
+        animation = Animation(message, frames, time.monotonic())
+        if initial is not None:
+            animation.shown = initial.fingerprint()
+        if not animation.frames:
+            animation.finished.set_result(True)
+            return animation
+        self.active[message.id] = animation
+        self._schedule(animation)
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick())
+        return animation
+
+    def cancel(self, message_id: int) -> bool:
+        animation = self.active.pop(message_id, None)
+        if animation is None:
+            return False
+        self._finish(animation, completed=False)
+        self.stats["cancelled"] += 1
+        return True
+
+    def _schedule(self, animation: Animation):
+        heapq.heappush(self._heap, (animation.due[animation.index], next(self._seq), animation))
+
+    def _finish(self, animation: Animation, completed: bool):
+        for frame in animation.frames[animation.index:]:
+            frame.close()
+        animation.index = len(animation.frames)
+        if not animation.finished.done():
+            animation.finished.set_result(completed)
+        if self.active.get(animation.message.id) is animation:
+            del self.active[animation.message.id]
+
+    async def _tick(self):
+        try:
+            while self._heap:
+                due = self._heap[0][0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                _, _, animation = heapq.heappop(self._heap)
+                # Animations mid-edit are rescheduled when their edit returns
+                if not animation.done and not animation.editing:
+                    self._advance(animation)
+        finally:
+            self._ticker = None
+
+    def _advance(self, animation: Animation):
+        now = time.monotonic()
+        last = len(animation.frames) - 1
+        target = animation.index
+        while target < last and animation.due[target + 1] <= now:
+            target += 1
+        for frame in animation.frames[animation.index:target]:
+            frame.close()
+        self.stats["dropped"] += target - animation.index
+
+        frame = animation.frames[target]
+        animation.index = target + 1
+        fingerprint = frame.fingerprint()
+        if fingerprint == animation.shown:
+            frame.close()
+            self.stats["unchanged"] += 1
+            self._next(animation)
+            return
+        animation.editing = True
+        asyncio.create_task(self._show(animation, frame, fingerprint))
+
+    async def _show(self, animation: Animation, frame: Frame, fingerprint):
+        try:
+            await animation.message.edit(**frame.kwargs)
+            animation.shown = fingerprint
+            self.stats["frames"] += 1
+        except discord.NotFound:
+            # Message deleted: nothing left to animate
+            self.cancel(animation.message.id)
+            return
+        except discord.HTTPException as e:
+            logger.warning(f"Animation frame failed on message {animation.message.id}: {e}")
+        finally:
+            animation.editing = False
+            frame.close()
+        self._next(animation)
+
+    def _next(self, animation: Animation):
+        if animation.done:
+            return
+        if animation.index >= len(animation.frames):
+            self.stats["played"] += 1
+            self._finish(animation, completed=True)
+            return
+        self._schedule(animation)
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick())
+        else:
+            self._wakeup.set()
+
+    def report(self) -> Dict[str, Any]:
+        return {"active": len(self.active), **self.stats}
+
+
+animations = AnimationEngine()
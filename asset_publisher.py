@@ -0,0 +1,190 @@
+# asset_publisher.py
+#
+# Upload-once URLs for static assets. The first time an asset is shown it is
+# uploaded to a dedicated asset channel (or webhook), and the CDN URL of that
+# attachment is stored with the asset's sha256 in json/rocket_asset_urls.json.
+# After that embeds point at the URL with set_image(url=...) and commands
+# upload nothing. A new hash (the file was replaced) or an expiring URL
+# triggers a fresh upload.
+#
+# Discord CDN URLs are signed and expire; the expiry is read from the `ex`
+# query parameter when present, otherwise ASSET_URL_TTL is assumed.
+#
+# Configure one of:
+#   ROCKET_ASSET_WEBHOOK_URL  webhook to post assets through (any endpoint that
+#                             answers like Discord's "execute webhook?wait=true")
+#   ROCKET_ASSET_CHANNEL_ID   channel the bot posts assets in
+# With neither set, assets are attached to each message as before.
+
+import os
+import io
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+import discord
+
+from assets import assets
+from file_io import read_json, write_json, run_io
+from resolver import get_resolver
+from serialization import dumps
+
+logger = logging.getLogger("TeamRocketBot")
+
+ASSET_URLS_FILE = "json/rocket_asset_urls.json"
+ASSET_WEBHOOK_URL = os.getenv("ROCKET_ASSET_WEBHOOK_URL")
+ASSET_CHANNEL_ID = os.getenv("ROCKET_ASSET_CHANNEL_ID")
+ASSET_URL_TTL = 20 * 3600  # seconds, when the URL doesn't say when it expires
+ASSET_URL_MARGIN = 3600  # re-upload this long before a URL expires
+ASSET_UPLOAD_RETRY = 300  # seconds to wait before retrying a failed upload
+
+
+class AssetUploader:
+    async def upload(self, data: bytes, filename: str) -> str:
+        """Upload the bytes and return the attachment URL."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release anything the uploader keeps open."""
+
+
+class WebhookUploader(AssetUploader):
+
+    def __init__(self, url: str, session: Optional[aiohttp.ClientSession] = None):
+        self.url = url
+        self._session = session
+
+    async def upload(self, data: bytes, filename: str) -> str:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        form = aiohttp.FormData()
+        form.add_field("payload_json", dumps({"attachments": [{"id": 0, "filename": filename}]}).decode(),
+                       content_type="application/json")
+        form.add_field("files[0]", data, filename=filename, content_type="application/octet-stream")
+        async with self._session.post(self.url, params={"wait": "true"}, data=form) as response:
+            response.raise_for_status()
+            message = await response.json()
+        return message["attachments"][0]["url"]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class ChannelUploader(AssetUploader):
+
+    def __init__(self, bot: discord.Client, channel_id: int):
+        self.bot = bot
+        self.channel_id = int(channel_id)
+
+    async def upload(self, data: bytes, filename: str) -> str:
+        channel = await get_resolver(self.bot).channel(self.channel_id)
+        if channel is None:
+            raise RuntimeError(f"Asset channel {self.channel_id} not found")
+        message = await channel.send(file=discord.File(io.BytesIO(data), filename=filename))
+        return message.attachments[0].url
+
+
+def url_expiry(url: str, now: float) -> float:
+    """Unix time a Discord CDN URL stops working (hex `ex` parameter), else now + ASSET_URL_TTL."""
+    ex = parse_qs(urlsplit(url).query).get("ex")
+    try:
+        return float(int(ex[0], 16)) if ex else now + ASSET_URL_TTL
+    except ValueError:
+        return now + ASSET_URL_TTL
+
+
+class AssetPublisher:
+
+    def __init__(self, uploader: Optional[AssetUploader], index_file: str = ASSET_URLS_FILE):
+        self.uploader = uploader
+        self.index_file = index_file
+        self._index: Optional[Dict[str, dict]] = None  # path -> {"sha256", "url", "expires"}
+        self._hashes: Dict[str, Tuple[bytes, str]] = {}  # path -> (bytes hashed, sha256)
+        self._uploads: Dict[str, asyncio.Task] = {}  # sha256 -> upload in flight
+        self._failed_until: Dict[str, float] = {}
+        self.stats = {"reused": 0, "uploaded": 0, "failed": 0}
+
+    async def _digest(self, path: str) -> Tuple[bytes, str]:
+        data = await assets.get_bytes(path)
+        known = self._hashes.get(path)
+        # The asset cache hands back the same bytes object until it re-reads the file
+        if known is None or known[0] is not data:
+            known = self._hashes[path] = (data, await run_io(lambda: hashlib.sha256(data).hexdigest()))
+        return known
+
+    async def url(self, path: str) -> Optional[str]:
+        """CDN URL for the asset, uploading it if needed. None when publishing is off or failing."""
+        if self.uploader is None:
+            return None
+        if self._index is None:
+            self._index = await read_json(self.index_file, {}, copy=True) or {}
+        key = os.path.normpath(path)
+        data, digest = await self._digest(key)
+        now = time.time()
+
+        record = self._index.get(key)
+        if record and record.get("sha256") == digest and record.get("expires", 0) - ASSET_URL_MARGIN > now:
+            self.stats["reused"] += 1
+            return record["url"]
+        if self._failed_until.get(digest, 0) > now:
+            return None
+
+        task = self._uploads.get(digest)
+        if task is None:
+            task = self._uploads[digest] = asyncio.create_task(self.uploader.upload(data, os.path.basename(key)))
+            task.add_done_callback(lambda _: self._uploads.pop(digest, None))
+        try:
+            url = await asyncio.shield(task)
+        except (aiohttp.ClientError, asyncio.TimeoutError, discord.HTTPException, RuntimeError, KeyError, IndexError, ValueError) as e:
+            self.stats["failed"] += 1
+            self._failed_until[digest] = now + ASSET_UPLOAD_RETRY
+            logger.warning(f"Asset upload failed for {key}, attaching instead: {e}")
+            return None
+
+        if self._index.get(key, {}).get("url") != url:
+            self.stats["uploaded"] += 1
+            self._index[key] = {"sha256": digest, "url": url, "expires": url_expiry(url, now)}
+            await write_json(self.index_file, self._index)
+        return url
+
+    async def image(self, embed: discord.Embed, path: str, filename: str) -> Optional[discord.File]:
+        """
+        Point the embed's image at the asset. Returns None when the published
+        URL was used, otherwise the discord.File to attach to the message.
+        """
+        url = await self.url(path)
+        if url:
+            embed.set_image(url=url)
+            return None
+        embed.set_image(url=f"attachment://{filename}")
+        return await assets.file(path, filename=filename)
+
+    async def close(self):
+        if self.uploader is not None:
+            await self.uploader.close()
+
+
+def get_publisher(bot: discord.Client) -> AssetPublisher:
+    publisher = getattr(bot, "_rocket_asset_publisher", None)
+    if publisher is None:
+        if ASSET_WEBHOOK_URL:
+            uploader = WebhookUploader(ASSET_WEBHOOK_URL)
+        elif ASSET_CHANNEL_ID:
+            uploader = ChannelUploader(bot, int(ASSET_CHANNEL_ID))
+        else:
+            uploader = None
+        publisher = AssetPublisher(uploader)
+        bot._rocket_asset_publisher = publisher
+    return publisher
+
+
+async def close_publisher(bot: discord.Client):
+    """Close the bot's publisher, if one was ever created (its webhook session on shutdown)."""
+    publisher = getattr(bot, "_rocket_asset_publisher", None)
+    if publisher is not None:
+        await publisher.close()
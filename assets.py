@@ -0,0 +1,105 @@
+# assets.py
+#
+# In-memory cache for the static images the cogs attach (pokemon GIFs,
+# campfire, drawing-date pictures). Bytes are read once on first use, kept in
+# an LRU bounded by total size, and handed out as BytesIO-backed discord.File
+# objects, so a warm command doesn't open or read anything on disk. Directory
+# listings used to pick random assets are cached the same way.
+#
+# When tools/optimize_assets.py has written assets/manifest.json, paths are
+# served from the optimized (and deduplicated) files it lists; a missing built
+# file falls back to the source path.
+#
+# Assets are treated as immutable while the bot runs; call clear() after
+# replacing files on disk.
+
+import io
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import discord
+
+from file_io import read_json, run_io
+
+ASSET_CACHE_BYTES = int(os.getenv("ROCKET_ASSET_CACHE_MB", "64")) * 1024 * 1024
+ASSET_MANIFEST_FILE = "assets/manifest.json"
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class AssetCache:
+
+    def __init__(self, max_bytes: int = ASSET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._bytes: "OrderedDict[str, bytes]" = OrderedDict()
+        self._listings: Dict[str, List[str]] = {}
+        self._manifest: Optional[Dict[str, dict]] = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    async def resolve(self, path: str, variant: Optional[str] = None) -> str:
+        """File to serve for a source asset path, per the manifest."""
+        if self._manifest is None:
+            manifest = await read_json(ASSET_MANIFEST_FILE, {}) or {}
+            self._manifest = {os.path.normpath(k): v for k, v in manifest.get("assets", {}).items()}
+        entry = self._manifest.get(os.path.normpath(path))
+        if entry is None:
+            return os.path.normpath(path)
+        if variant and variant in entry.get("variants", {}):
+            return os.path.normpath(entry["variants"][variant]["file"])
+        return os.path.normpath(entry["file"])
+
+    async def get_bytes(self, path: str, variant: Optional[str] = None) -> bytes:
+        key = await self.resolve(path, variant)
+        data = self._bytes.get(key)
+        if data is not None:
+            self.stats["hits"] += 1
+            self._bytes.move_to_end(key)
+            return data
+
+        self.stats["misses"] += 1
+        try:
+            data = await run_io(_read_bytes, key)
+        except FileNotFoundError:
+            if key == os.path.normpath(path):
+                raise
+            # Manifest points at a build output that wasn't deployed; serve the source
+            key = os.path.normpath(path)
+            data = await run_io(_read_bytes, key)
+        if len(data) <= self.max_bytes and key not in self._bytes:
+            self._bytes[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._bytes.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats["evictions"] += 1
+        return data
+
+    async def file(self, path: str, filename: Optional[str] = None, variant: Optional[str] = None,
+                   **kwargs) -> discord.File:
+        """A discord.File over the cached bytes. Each call gets its own BytesIO, so files can be sent concurrently."""
+        data = await self.get_bytes(path, variant)
+        return discord.File(io.BytesIO(data), filename=filename or os.path.basename(path), **kwargs)
+
+    async def listdir(self, folder: str, keep: Optional[Callable[[str], bool]] = None) -> List[str]:
+        key = os.path.normpath(folder)
+        names = self._listings.get(key)
+        if names is None:
+            names = self._listings[key] = sorted(await run_io(os.listdir, key))
+        return [name for name in names if keep is None or keep(name)]
+
+    def clear(self):
+        self._bytes.clear()
+        self._listings.clear()
+        self._manifest = None
+        self.size = 0
+
+    def report(self) -> Dict[str, int]:
+        return {"entries": len(self._bytes), "bytes": self.size, **self.stats}
+
+
+assets = AssetCache()
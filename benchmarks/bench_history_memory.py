@@ -0,0 +1,118 @@
+# benchmarks/bench_history_memory.py
+#
+# Bytes per history record for the old list-of-tuples layout versus the
+# columnar GuildHistory/UserHistory store, measured with tracemalloc. The
+# second table is the real resident set: every user's history loaded through
+# JsonBackend, once with the guild shard cached next to the columns (the old
+# layout) and once from per-user files with nothing cached by the backend.
+#
+#   python benchmarks/bench_history_memory.py [records ...]
+
+import os
+import sys
+import gc
+import random
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from date_models import GuildHistory  # noqa: E402
+from serialization import dumps, loads  # noqa: E402
+from storage import JsonBackend, atomic_write  # noqa: E402
+
+GUILD_ID = "1"
+
+REASONS = ["too busy", "not my type", "already taken", "No reason given"]
+
+
+def make_payload(records: int, users: int = 500, seed: int = 7):
+    """Stored JSON shape: {user_id: [[partner, matched, reason?], ...]}."""
+    rng = random.Random(seed)
+    user_ids = [str(10**17 + rng.randrange(10**17)) for _ in range(users)]
+    payload = {uid: [] for uid in user_ids}
+    for _ in range(records):
+        uid = rng.choice(user_ids)
+        partner = int(rng.choice(user_ids))
+        if rng.random() < 0.5:
+            payload[uid].append([partner, True])
+        else:
+            payload[uid].append([partner, False, f"Rejected by {uid[-4:]}: {rng.choice(REASONS)}"])
+    return payload
+
+
+def build_tuples(payload):
+    # What load_data used to build: one tuple per record. Decoding JSON gives every
+    # record its own int and str objects, so copy them here to count that too.
+    guild = {}
+    for user_id, recs in payload.items():
+        parsed = []
+        for entry in recs:
+            uid, matched, *rest = entry
+            reason = str(rest[0]) if rest else ""
+            parsed.append((int(str(uid)), bool(matched), "".join(reason)))
+        guild[user_id] = parsed
+    return guild
+
+
+def build_columnar(payload):
+    guild = GuildHistory()
+    for user_id, recs in payload.items():
+        guild.load_user(user_id, recs)
+    return guild
+
+
+def build_shard_cached(root):
+    # The old JSON layout: one history shard per guild, kept parsed by the backend
+    def build(payload):
+        with open(os.path.join(root, GUILD_ID, "history.json"), "rb") as f:
+            shard = loads(f.read())
+        guild = GuildHistory()
+        for user_id in payload:
+            guild.load_user(user_id, shard.get(user_id))
+        return shard, guild
+    return build
+
+
+def build_per_user(root):
+    def build(payload):
+        backend = JsonBackend(root)
+        guild = GuildHistory()
+        for user_id in payload:
+            guild.load_user(user_id, backend.load("history", GUILD_ID, user_id))
+        return backend, guild
+    return build
+
+
+def measure(builder, payload) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = builder(payload)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'records':>10}{'tuples B/rec':>16}{'columnar B/rec':>18}{'saving':>10}")
+    for n in sizes:
+        payload = make_payload(n)
+        old = measure(build_tuples, payload) / n
+        new = measure(build_columnar, payload) / n
+        print(f"{n:>10,}{old:>16.1f}{new:>18.1f}{old / new:>9.1f}x")
+
+    print(f"\n{'users x records':>16}{'shard cached B/rec':>20}{'per-user B/rec':>16}{'saving':>10}")
+    for users, per_user in ((1000, 100), (200, 500)):
+        n = users * per_user
+        payload = make_payload(n, users=users)
+        with tempfile.TemporaryDirectory() as shard_root, tempfile.TemporaryDirectory() as user_root:
+            atomic_write(os.path.join(shard_root, GUILD_ID, "history.json"), dumps(payload))
+            JsonBackend(user_root).write([("history", GUILD_ID, uid, recs) for uid, recs in payload.items()])
+            old = measure(build_shard_cached(shard_root), payload) / n
+            new = measure(build_per_user(user_root), payload) / n
+        label = f"{users} x {per_user}"
+        print(f"{label:>16}{old:>20.1f}{new:>16.1f}{old / new:>9.1f}x")
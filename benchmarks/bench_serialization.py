@@ -0,0 +1,79 @@
+# benchmarks/bench_serialization.py
+#
+# Encode/decode time and file size for synthetic guild histories, comparing
+# the old indent=2 stdlib output with the compact paths in serialization.py.
+#
+#   python benchmarks/bench_serialization.py [records ...]
+
+import os
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+
+REASONS = ["too busy", "not my type", "already taken", "Rejected by Jessie: nope", ""]
+
+
+def make_history(records: int, users_per_guild: int = 500, seed: int = 7):
+    rng = random.Random(seed)
+    user_ids = [str(10**17 + rng.randrange(10**17)) for _ in range(users_per_guild)]
+    guild = {uid: [] for uid in user_ids}
+    for _ in range(records):
+        uid = rng.choice(user_ids)
+        partner = int(rng.choice(user_ids))
+        if rng.random() < 0.5:
+            guild[uid].append([partner, True])
+        else:
+            guild[uid].append([partner, False, rng.choice(REASONS) or "No reason given"])
+    return {"1390354711420604493": guild}
+
+
+def timed(fn, repeat: int = 5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(records: int):
+    data = make_history(records)
+    encoders = {
+        "stdlib indent=2 (old)": (
+            lambda: json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"),
+            lambda b: json.loads(b),
+        ),
+        "stdlib compact": (
+            lambda: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            lambda b: json.loads(b),
+        ),
+    }
+    if serialization.orjson:
+        orjson = serialization.orjson
+        encoders["orjson compact"] = (lambda: orjson.dumps(data), orjson.loads)
+
+    print(f"\n{records:,} history records")
+    print(f"{'encoder':<24}{'encode ms':>12}{'decode ms':>12}{'size KB':>12}{'speedup':>10}")
+    baseline = None
+    for name, (encode, decode) in encoders.items():
+        enc_time, payload = timed(encode)
+        dec_time, _ = timed(lambda: decode(payload))
+        total = enc_time + dec_time
+        baseline = baseline or total
+        print(
+            f"{name:<24}{enc_time * 1000:>12.2f}{dec_time * 1000:>12.2f}"
+            f"{len(payload) / 1024:>12.1f}{baseline / total:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"serialization backend in use: {serialization.BACKEND}")
+    for n in sizes:
+        run(n)
@@ -0,0 +1,417 @@
+# campfire_state.py
+#
+# Campfires as explicit state machines, one per guild, held in memory:
+#
+#   lit -> gathering -> awaiting_confession -> collecting_reactions -> closed
+#
+# (any open campfire can also be closed early: timeout, reset). Every
+# transition is validated, appended to a JSON-lines journal as one small entry
+# and then applied, so the journal replays to exactly the in-memory state.
+# On startup the journal is replayed and compacted to one snapshot entry per
+# guild. A user -> guild index of open campfires makes "which campfire is this
+# camper in" a dictionary lookup.
+#
+# Commands change a campfire through helpers.update(): the function gets a
+# draft (a private copy; phase None when the guild has no campfire), calls
+# draft.transition() on it, and the transitions it recorded are journaled
+# and applied in order when it returns.
+#
+# Reactions are the exception to "journal, then apply": they can arrive in
+# floods, so they are counted in memory at once and reach the journal as one
+# batch entry REACTION_FLUSH_DELAY seconds later (or right before the guild's
+# next transition), instead of one fsync per reaction.
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from file_io import run_io
+from reactions import ReactionTally
+from serialization import dumps, loads
+from storage import atomic_write
+
+logger = logging.getLogger("TeamRocketBot")
+
+CAMPFIRE_JOURNAL_FILE = "json/rocket_campfire.journal"
+LEGACY_CAMPFIRE_FILE = "json/rocket_campfire.json"
+JOURNAL_COMPACT_LINES = int(os.getenv("ROCKET_CAMPFIRE_JOURNAL_LINES", "1000"))
+REACTION_FLUSH_DELAY = float(os.getenv("ROCKET_REACTION_FLUSH_SECONDS", "2"))
+
+LIT = "lit"
+GATHERING = "gathering"
+AWAITING_CONFESSION = "awaiting_confession"
+COLLECTING_REACTIONS = "collecting_reactions"
+CLOSED = "closed"
+
+OPEN_PHASES = (LIT, GATHERING, AWAITING_CONFESSION, COLLECTING_REACTIONS)
+JOINABLE_PHASES = (LIT, GATHERING, AWAITING_CONFESSION)  # "active" before the confession
+
+# event -> (phases it may happen in, phase afterwards; None keeps the phase)
+TRANSITIONS = {
+    "lit": ((None, CLOSED), LIT),
+    "thread": (OPEN_PHASES, None),
+    "join": ((LIT, GATHERING), GATHERING),
+    "chosen": ((GATHERING,), AWAITING_CONFESSION),
+    "confessed": ((AWAITING_CONFESSION,), COLLECTING_REACTIONS),
+    "reaction": ((COLLECTING_REACTIONS,), None),  # journals written before reactions were batched
+    "reactions": ((COLLECTING_REACTIONS,), None),
+    "closed": (OPEN_PHASES, CLOSED),
+}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def _validate(campfire: Optional["Campfire"], entry: dict):
+    allowed, _ = TRANSITIONS[entry["event"]]
+    phase = campfire.phase if campfire else None
+    if phase not in allowed:
+        raise InvalidTransition(f"{entry['event']} not allowed while campfire is {phase}")
+    if entry["event"] == "join" and entry["user"] in campfire.campers:
+        raise InvalidTransition(f"{entry['user']} already joined")
+
+
+class Campfire:
+    FIELDS = (
+        "guild_id", "day", "phase", "starter_id", "channel_id", "thread_id", "campers",
+        "chosen_id", "confession", "public", "confession_msg_id", "reactions", "closed_reason",
+    )
+    __slots__ = FIELDS + ("ordinal", "events")
+
+    def __init__(self, guild_id: str, day: str, starter_id: Optional[str], channel_id: Optional[int]):
+        self.guild_id = guild_id
+        self.day = day
+        self.ordinal = date.fromisoformat(day).toordinal() if day else 0  # for comparing with clock.day()
+        self.phase = LIT
+        self.starter_id = starter_id
+        self.channel_id = channel_id
+        self.thread_id: Optional[int] = None
+        self.campers: List[str] = []
+        self.chosen_id: Optional[str] = None
+        self.confession: Optional[str] = None
+        self.public: Optional[bool] = None
+        self.confession_msg_id: Optional[int] = None
+        self.reactions = ReactionTally()
+        self.closed_reason: Optional[str] = None
+        self.events: Optional[List[dict]] = None  # transitions recorded on a draft
+
+    @property
+    def active(self) -> bool:
+        return self.phase in JOINABLE_PHASES
+
+    @property
+    def confessed(self) -> bool:
+        return self.confession is not None
+
+    def apply(self, entry: dict):
+        """Apply a validated transition other than "lit" (which starts a new campfire)."""
+        event = entry["event"]
+        if event == "thread":
+            self.thread_id = entry["thread"]
+        elif event == "join":
+            self.campers.append(entry["user"])
+        elif event == "chosen":
+            self.chosen_id = entry["user"]
+        elif event == "confessed":
+            self.confession = entry["message"]
+            self.public = entry["public"]
+            self.confession_msg_id = entry["message_id"]
+        elif event == "reaction":
+            self.reactions.add(entry["user"], entry["emoji"])
+        elif event == "reactions":
+            for user_id, emoji in entry["items"]:
+                self.reactions.add(user_id, emoji)
+        elif event == "closed":
+            self.closed_reason = entry.get("reason")
+
+        target = TRANSITIONS[event][1]
+        if target is not None:
+            self.phase = target
+
+    def transition(self, event: str, **fields) -> "Campfire":
+        """
+        On a draft: validate and apply a transition right away and record it
+        for CampfireBook.commit(). Raises InvalidTransition if it isn't allowed.
+        """
+        entry = {"guild": self.guild_id, "event": event, **fields}
+        _validate(self, entry)
+        if event == "lit":
+            events = self.events
+            self.__init__(self.guild_id, fields["day"], fields.get("starter"), fields.get("channel"))
+            self.events = events
+        else:
+            self.apply(entry)
+        self.events.append(entry)
+        return self
+
+    def to_state(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self.FIELDS}
+        state["reactions"] = self.reactions.to_payload()
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Campfire":
+        campfire = cls(state["guild_id"], state["day"], state.get("starter_id"), state.get("channel_id"))
+        for name in cls.FIELDS:
+            if name in state:
+                setattr(campfire, name, state[name])
+        campfire.campers = list(campfire.campers)
+        reactions = state.get("reactions") or []
+        # Snapshots written before reactions were tallied store a user_id -> emoji dict
+        campfire.reactions = ReactionTally(reactions.items() if isinstance(reactions, dict) else reactions)
+        return campfire
+
+    @classmethod
+    def from_legacy(cls, guild_id: str, record: Dict[str, Any]) -> "Campfire":
+        """Convert a record from the old rocket_campfire.json."""
+        campfire = cls(guild_id, record.get("last_reset") or "", record.get("starter_camper"),
+                       record.get("starter_camper_channel_id"))
+        campfire.thread_id = record.get("thread_id")
+        campfire.campers = [str(c) for c in record.get("campers") or []]
+        campfire.chosen_id = record.get("chosen_camper")
+        campfire.confession = record.get("confession_message")
+        if record.get("isPublic") is not None:
+            campfire.public = record.get("isPublic") == "yes"
+        campfire.confession_msg_id = record.get("confession_msg_id")
+        campfire.reactions = ReactionTally((r["user_id"], r["emoji"]) for r in record.get("reactions") or [])
+        if not record.get("active"):
+            # The old format can't tell whether reactions were still being collected
+            campfire.phase = CLOSED
+        elif campfire.chosen_id:
+            campfire.phase = AWAITING_CONFESSION
+        elif campfire.campers:
+            campfire.phase = GATHERING
+        return campfire
+
+
+def _read_journal(path: str) -> List[dict]:
+    entries = []
+    try:
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(loads(line))
+                except ValueError:
+                    # A crash mid-append leaves at most a torn last line
+                    logger.warning(f"Skipping unreadable campfire journal line {number}")
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+class CampfireJournal:
+    """Append-only JSON-lines file; blocking methods, meant for run_io."""
+
+    def __init__(self, path: str = CAMPFIRE_JOURNAL_FILE):
+        self.path = path
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self) -> List[dict]:
+        with self._lock:
+            entries = _read_journal(self.path)
+            self.lines = len(entries)
+            return entries
+
+    def append(self, entry: dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(dumps(entry) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.lines += 1
+
+    def rewrite(self, entries: Iterable[dict]):
+        entries = list(entries)
+        with self._lock:
+            atomic_write(self.path, b"".join(dumps(entry) + b"\n" for entry in entries))
+            self.lines = len(entries)
+
+
+class CampfireBook:
+    """Every guild's campfire, the user -> open campfire index and the journal behind them."""
+
+    def __init__(self, journal: Optional[CampfireJournal] = None, legacy_file: str = LEGACY_CAMPFIRE_FILE):
+        self.journal = journal or CampfireJournal()
+        self.legacy_file = legacy_file
+        self.campfires: Dict[str, Campfire] = {}
+        self._by_user: Dict[str, Set[str]] = {}  # user_id -> guild ids of open campfires they're in
+        self._journal_lock = asyncio.Lock()
+        self._pending_reactions: Dict[str, List[List[str]]] = {}  # guild_id -> counted, not yet journaled
+        self._reaction_flush: Optional[asyncio.Task] = None
+
+    def get(self, guild_id: str) -> Optional[Campfire]:
+        return self.campfires.get(guild_id)
+
+    def open_for(self, user_id: str) -> List[Campfire]:
+        return [self.campfires[guild_id] for guild_id in self._by_user.get(user_id, ())]
+
+    def awaiting_confession_from(self, user_id: str) -> Optional[Campfire]:
+        for campfire in self.open_for(user_id):
+            if campfire.phase == AWAITING_CONFESSION and campfire.chosen_id == user_id:
+                return campfire
+        return None
+
+    # ---------- transitions ----------
+    def _check(self, entry: dict):
+        _validate(self.campfires.get(entry["guild"]), entry)
+
+    def _index(self, campfire: Campfire, add: bool):
+        for user_id in campfire.campers:
+            guilds = self._by_user.get(user_id)
+            if add:
+                self._by_user.setdefault(user_id, set()).add(campfire.guild_id)
+            elif guilds is not None:
+                guilds.discard(campfire.guild_id)
+                if not guilds:
+                    del self._by_user[user_id]
+
+    def _apply(self, entry: dict) -> Campfire:
+        guild_id, event = entry["guild"], entry["event"]
+        campfire = self.campfires.get(guild_id)
+
+        if event == "snapshot":
+            if campfire is not None:
+                self._index(campfire, add=False)
+            campfire = self.campfires[guild_id] = Campfire.from_state(entry["state"])
+            if campfire.phase in OPEN_PHASES:
+                self._index(campfire, add=True)
+            return campfire
+
+        self._check(entry)
+        if event == "lit":
+            campfire = self.campfires[guild_id] = Campfire(guild_id, entry["day"], entry.get("starter"), entry.get("channel"))
+            return campfire
+        campfire.apply(entry)
+        if event == "join":
+            self._by_user.setdefault(entry["user"], set()).add(guild_id)
+        elif event == "closed":
+            self._index(campfire, add=False)
+        return campfire
+
+    async def transition(self, guild_id: str, event: str, **fields) -> Campfire:
+        """Validate, journal and apply one transition. Raises InvalidTransition if it isn't allowed now."""
+        entry = {"guild": guild_id, "event": event, "at": int(time.time()), **fields}
+        async with self._journal_lock:
+            await self._write_reactions(guild_id)  # keep the journal in event order
+            self._check(entry)
+            await run_io(self.journal.append, entry)
+            campfire = self._apply(entry)
+            if self.journal.lines > JOURNAL_COMPACT_LINES:
+                await self._compact()
+        return campfire
+
+    # ---------- drafts ----------
+    def draft(self, guild_id: str) -> Campfire:
+        """A private copy of the guild's campfire to record transitions on; phase None if there is none."""
+        campfire = self.campfires.get(guild_id)
+        if campfire is None:
+            draft = Campfire(guild_id, "", None, None)
+            draft.phase = None
+        else:
+            draft = Campfire.from_state(campfire.to_state())
+        draft.events = []
+        return draft
+
+    async def commit(self, draft: Campfire) -> Optional[Campfire]:
+        """Journal and apply the transitions recorded on a draft, in order."""
+        for entry in draft.events:
+            fields = {name: value for name, value in entry.items() if name not in ("guild", "event")}
+            await self.transition(draft.guild_id, entry["event"], **fields)
+        return self.campfires.get(draft.guild_id)
+
+    # ---------- reactions ----------
+    def add_reaction(self, guild_id: str, user_id: str, emoji: str) -> bool:
+        """Count a camper's reaction now and journal it with the next batch. False if it doesn't count."""
+        campfire = self.campfires.get(guild_id)
+        if campfire is None or campfire.phase != COLLECTING_REACTIONS:
+            return False
+        if not campfire.reactions.add(user_id, emoji):
+            return False
+        self._pending_reactions.setdefault(guild_id, []).append([user_id, emoji])
+        if self._reaction_flush is None or self._reaction_flush.done():
+            self._reaction_flush = asyncio.create_task(self._flush_reactions_later())
+        return True
+
+    async def _flush_reactions_later(self):
+        await asyncio.sleep(REACTION_FLUSH_DELAY)
+        await self.flush()
+
+    async def _write_reactions(self, guild_id: Optional[str] = None):
+        """Journal pending reaction batches (one guild or all). Call with the journal lock held."""
+        for gid in [guild_id] if guild_id is not None else list(self._pending_reactions):
+            items = self._pending_reactions.pop(gid, None)
+            if items:
+                await run_io(self.journal.append, {"guild": gid, "event": "reactions", "at": int(time.time()), "items": items})
+
+    async def flush(self):
+        async with self._journal_lock:
+            await self._write_reactions()
+
+    # ---------- recovery ----------
+    def _snapshots(self) -> List[dict]:
+        return [
+            {"guild": guild_id, "event": "snapshot", "state": campfire.to_state()}
+            for guild_id, campfire in self.campfires.items()
+        ]
+
+    async def _compact(self):
+        # Snapshots hold every counted reaction, including ones not journaled yet
+        self._pending_reactions.clear()
+        await run_io(self.journal.rewrite, self._snapshots())
+
+    async def recover(self):
+        """Rebuild every campfire from the journal (or the old JSON file, once) and compact the journal."""
+        async with self._journal_lock:
+            self.campfires.clear()
+            self._by_user.clear()
+            self._pending_reactions.clear()
+            if await run_io(self.journal.exists):
+                entries = await run_io(self.journal.read)
+                for entry in entries:
+                    try:
+                        self._apply(entry)
+                    except (InvalidTransition, KeyError) as e:
+                        logger.warning(f"Skipping campfire journal entry {entry.get('event')!r}: {e}")
+            else:
+                entries = []
+                legacy = await run_io(_read_legacy, self.legacy_file)
+                for guild_id, record in legacy.items():
+                    if isinstance(record, dict):
+                        self._apply({"guild": guild_id, "event": "snapshot",
+                                     "state": Campfire.from_legacy(guild_id, record).to_state()})
+                if legacy:
+                    logger.info(f"Imported {len(self.campfires)} campfire(s) from {self.legacy_file}.")
+            # Compacted journals are one snapshot per guild; anything longer gets rewritten
+            if len(entries) != len(self.campfires) or not entries:
+                await self._compact()
+
+    def report(self) -> Dict[str, int]:
+        phases = {}
+        for campfire in self.campfires.values():
+            phases[campfire.phase] = phases.get(campfire.phase, 0) + 1
+        return {"campfires": len(self.campfires), "indexed_users": len(self._by_user),
+                "journal_lines": self.journal.lines,
+                "pending_reactions": sum(len(items) for items in self._pending_reactions.values()), **phases}
+
+
+def _read_legacy(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "rb") as f:
+            return loads(f.read()) or {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+campfires = CampfireBook()
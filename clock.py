@@ -0,0 +1,165 @@
+# clock.py
+#
+# The one source of "today". Each guild's day follows its timezone (from
+# TIMEZONES_FILE, default ROCKET_TIMEZONE); the current day of every zone is
+# cached together with the timestamp of its next midnight, so asking for
+# today is a float comparison and a dict lookup until that midnight passes.
+#
+# Day boundaries are owned here too: each zone's next midnight is a durable
+# timer on the timer wheel (so a midnight missed while the bot was down still
+# fires on startup), and when it passes the rollover listeners are called for
+# that zone's guilds in batches of ROLLOVER_BATCH, ROLLOVER_STAGGER seconds
+# apart, so daily cleanup doesn't all land on the same tick.
+
+import os
+import time
+import asyncio
+import logging
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import discord
+
+from file_io import read_json, write_json
+from timers import timers
+
+logger = logging.getLogger("TeamRocketBot")
+
+TIMEZONES_FILE = "json/rocket_timezones.json"
+DEFAULT_TIMEZONE = os.getenv("ROCKET_TIMEZONE", "UTC")
+ROLLOVER_BATCH = int(os.getenv("ROCKET_ROLLOVER_BATCH", "50"))  # guilds per listener call
+ROLLOVER_STAGGER = float(os.getenv("ROCKET_ROLLOVER_STAGGER", "1"))  # seconds between batches
+
+# listener(guild_id -> the day that just started, ISO) for one batch of guilds
+RolloverListener = Callable[[Dict[str, str]], Awaitable[None]]
+
+
+class Day:
+    __slots__ = ("date", "ordinal", "iso", "ends_at")
+
+    def __init__(self, day: date, ends_at: float):
+        self.date = day
+        self.ordinal = day.toordinal()
+        self.iso = day.isoformat()
+        self.ends_at = ends_at
+
+
+class Clock:
+
+    def __init__(self, path: str = TIMEZONES_FILE, default: str = DEFAULT_TIMEZONE):
+        self.path = path
+        self.default = default
+        self._guild_zones: Dict[str, str] = {}  # guild_id -> zone name, only guilds that set one
+        self._zones: Dict[str, ZoneInfo] = {}
+        self._days: Dict[str, Day] = {}  # zone name -> current day
+        self._listeners: Dict[str, RolloverListener] = {}
+        self._bot: Optional[discord.Client] = None
+        self.stats = {"rollovers": 0, "batches": 0, "failed": 0}
+
+    # ---------- days ----------
+    def zone_of(self, guild_id=None) -> str:
+        if guild_id is None:
+            return self.default
+        return self._guild_zones.get(str(guild_id), self.default)
+
+    def _zone(self, name: str) -> ZoneInfo:
+        zone = self._zones.get(name)
+        if zone is None:
+            zone = self._zones[name] = ZoneInfo(name)
+        return zone
+
+    def _day(self, zone_name: str) -> Day:
+        day = self._days.get(zone_name)
+        if day is None or time.time() >= day.ends_at:
+            zone = self._zone(zone_name)
+            today = datetime.now(zone).date()
+            midnight = datetime.combine(today + timedelta(days=1), dtime.min, tzinfo=zone)
+            day = self._days[zone_name] = Day(today, midnight.timestamp())
+        return day
+
+    def day(self, guild_id=None) -> int:
+        """Today as a date ordinal, for cheap comparisons."""
+        return self._day(self.zone_of(guild_id)).ordinal
+
+    def today(self, guild_id=None) -> str:
+        """Today as YYYY-MM-DD, the form stored in the data files."""
+        return self._day(self.zone_of(guild_id)).iso
+
+    def date(self, guild_id=None) -> date:
+        return self._day(self.zone_of(guild_id)).date
+
+    # ---------- timezones ----------
+    async def load(self):
+        data = await read_json(self.path, {}) or {}
+        for guild_id, name in data.items():
+            try:
+                self._zone(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                logger.warning(f"Ignoring unknown timezone {name!r} for guild {guild_id}")
+                continue
+            self._guild_zones[str(guild_id)] = name
+        self._zone(self.default)
+
+    async def set_zone(self, guild_id: str, name: str):
+        """Raises ValueError for an unknown zone name."""
+        try:
+            self._zone(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {name}")
+        if name == self.default:
+            self._guild_zones.pop(guild_id, None)
+        else:
+            self._guild_zones[guild_id] = name
+        await write_json(self.path, dict(self._guild_zones))
+        self._schedule(name)
+
+    # ---------- rollover ----------
+    def on_rollover(self, name: str, listener: RolloverListener):
+        self._listeners[name] = listener
+
+    def remove_rollover(self, name: str):
+        self._listeners.pop(name, None)
+
+    def _schedule(self, zone_name: str, keep: bool = False):
+        key = f"clock:{zone_name}"
+        if keep and timers.due(key) is not None:
+            return  # restored from disk; fires on its own, possibly right away
+        ends_at = self._day(zone_name).ends_at
+        timers.schedule_at(key, ends_at, "day_rollover", zone=zone_name, at=ends_at)
+
+    def start(self, bot: discord.Client):
+        self._bot = bot
+        timers.register("day_rollover", self._rollover)
+        for zone_name in {self.default, *self._guild_zones.values()}:
+            self._schedule(zone_name, keep=True)
+
+    async def _rollover(self, _key: str, payload: dict):
+        zone_name = payload["zone"]
+        early = time.time() < payload.get("at", 0)  # the wheel ticks in whole seconds
+        self._schedule(zone_name)  # the next midnight
+        if early:
+            return
+        today = self._day(zone_name).iso
+        guild_ids = [str(guild.id) for guild in self._bot.guilds if self.zone_of(guild.id) == zone_name]
+        self.stats["rollovers"] += 1
+        logger.info(f"New day {today} in {zone_name}: rolling over {len(guild_ids)} guild(s).")
+
+        for start in range(0, len(guild_ids), ROLLOVER_BATCH):
+            if start:
+                await asyncio.sleep(ROLLOVER_STAGGER)
+            batch = {guild_id: today for guild_id in guild_ids[start:start + ROLLOVER_BATCH]}
+            for name, listener in list(self._listeners.items()):
+                try:
+                    await listener(batch)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.exception(f"Rollover listener {name} failed: {e}")
+            self.stats["batches"] += 1
+
+    def report(self) -> Dict[str, int]:
+        return {"zones": len({self.default, *self._guild_zones.values()}), "guild_zones": len(self._guild_zones),
+                "listeners": len(self._listeners), **self.stats}
+
+
+clock = Clock()
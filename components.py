@@ -0,0 +1,188 @@
+# components.py
+#
+# Stateless button routing. A routed button's custom_id carries everything
+# needed to handle a click ("rocket:<route>:<arg>:<arg>..."), and a single
+# DynamicItem class registered with the bot parses it and calls the handler
+# registered for <route>. Messages don't keep View objects alive, and buttons
+# posted before a restart keep working once their cog has loaded again.
+#
+# Paginators are built on top of this: a pager is a (count, render) pair
+# registered under a name, and the page buttons encode pager, argument,
+# current page and direction.
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import discord
+from discord import ButtonStyle
+
+from helpers import logger
+from ttl_cache import TTLCache, MISSING
+
+ROUTE_PREFIX = "rocket"
+CUSTOM_ID_LIMIT = 100  # Discord's maximum custom_id length
+PAGE_CACHE_TTL = 30  # seconds a rendered page is reused
+PAGE_CACHE_ENTRIES = 500
+
+RouteHandler = Callable[..., Awaitable[None]]
+PageCount = Callable[[discord.Guild, str], Awaitable[int]]
+PageRender = Callable[[discord.Guild, str, int], Awaitable[discord.Embed]]
+
+_routes: Dict[str, RouteHandler] = {}
+
+
+def register_route(name: str, handler: RouteHandler):
+    """`handler(interaction, *args)` is called with the custom_id arguments as strings."""
+    _routes[name] = handler
+
+
+def unregister_route(name: str):
+    _routes.pop(name, None)
+
+
+def encode_custom_id(route: str, *args) -> str:
+    parts = [ROUTE_PREFIX, route, *(str(arg) for arg in args)]
+    if any(":" in part for part in parts[1:]):
+        raise ValueError(f"Route arguments can't contain ':': {parts[1:]}")
+    custom_id = ":".join(parts)
+    if len(custom_id) > CUSTOM_ID_LIMIT:
+        raise ValueError(f"custom_id is longer than {CUSTOM_ID_LIMIT} characters: {custom_id}")
+    return custom_id
+
+
+class RoutedButton(discord.ui.DynamicItem[discord.ui.Button], template=rf"{ROUTE_PREFIX}:(?P<route>[a-z_]+)(?P<args>(?::[^:]*)*)"):
+
+    def __init__(self, route: str, *args, label: Optional[str] = None, style: ButtonStyle = ButtonStyle.secondary,
+                 emoji=None, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label=label, style=style, emoji=emoji, disabled=disabled,
+            custom_id=encode_custom_id(route, *args),
+        ))
+        self.route = route
+        self.args = [str(arg) for arg in args]
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        args = match["args"].split(":")[1:]
+        return cls(match["route"], *args, label=item.label, style=item.style, emoji=item.emoji, disabled=item.disabled)
+
+    async def callback(self, interaction: discord.Interaction):
+        handler = _routes.get(self.route)
+        if handler is None:
+            await interaction.response.send_message("⚠️ This button isn't active right now.", ephemeral=True)
+            return
+        await handler(interaction, *self.args)
+
+
+def routed_view(*buttons: RoutedButton) -> discord.ui.View:
+    """
+    A View holding routed buttons, to pass to send/edit. It is stopped up
+    front, so discord.py doesn't store it: clicks reach the handlers through
+    the registered RoutedButton class instead.
+    """
+    view = discord.ui.View(timeout=None)
+    for button in buttons:
+        view.add_item(button)
+    view.stop()
+    return view
+
+
+def setup_components(bot: discord.Client):
+    bot.add_dynamic_items(RoutedButton)
+
+
+# === Pagination ===
+_pagers: Dict[str, Tuple[PageCount, PageRender]] = {}
+_pages = TTLCache(PAGE_CACHE_ENTRIES)
+_rendering: Dict[Hashable, asyncio.Task] = {}
+
+
+def register_pager(name: str, count: PageCount, render: PageRender):
+    """`count(guild, arg)` gives the number of pages, `render(guild, arg, page)` builds one."""
+    _pagers[name] = (count, render)
+
+
+def unregister_pager(name: str):
+    _pagers.pop(name, None)
+
+
+def _render(name: str, guild: discord.Guild, arg: str, page: int, total: int) -> asyncio.Task:
+    # The page count is part of the key, so pages re-render when the underlying data grows or shrinks
+    key = (name, guild.id, arg, page, total)
+    task = _rendering.get(key)
+    if task is None:
+        _, render = _pagers[name]
+        task = _rendering[key] = asyncio.create_task(render(guild, arg, page))
+        task.add_done_callback(lambda t: _rendered(key, t))
+    return task
+
+
+def _rendered(key: Hashable, task: asyncio.Task):
+    _rendering.pop(key, None)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error(f"Failed to render page {key}: {task.exception()}")
+        return
+    _pages.put(key, task.result(), PAGE_CACHE_TTL)
+
+
+def _cached_page(name: str, guild: discord.Guild, arg: str, page: int, total: int) -> Optional[discord.Embed]:
+    page = _pages.get((name, guild.id, arg, page, total))
+    return None if page is MISSING else page
+
+
+async def get_page(name: str, guild: discord.Guild, arg: str, page: int, total: int) -> discord.Embed:
+    cached = _cached_page(name, guild, arg, page, total)
+    if cached is not None:
+        return cached
+    return await asyncio.shield(_render(name, guild, arg, page, total))
+
+
+def prefetch_page(name: str, guild: discord.Guild, arg: str, page: int, total: int):
+    page %= total
+    if _cached_page(name, guild, arg, page, total) is None:
+        _render(name, guild, arg, page, total)
+
+
+def pager_view(name: str, arg: str, page: int, total: int) -> Optional[discord.ui.View]:
+    if total <= 1:
+        return None
+    return routed_view(
+        RoutedButton("page", name, arg, page, -1, label="◀️"),
+        RoutedButton("page", name, arg, page, 1, label="▶️"),
+    )
+
+
+async def first_page(name: str, guild: discord.Guild, arg: str = "") -> Tuple[discord.Embed, Optional[discord.ui.View]]:
+    """Embed and buttons for page one. The page after it is rendered in the background."""
+    count, _ = _pagers[name]
+    total = max(1, await count(guild, arg))
+    embed = await get_page(name, guild, arg, 0, total)
+    if total > 1:
+        prefetch_page(name, guild, arg, 1, total)
+    return embed, pager_view(name, arg, 0, total)
+
+
+async def _handle_page(interaction: discord.Interaction, name: str, arg: str, page: str, step: str):
+    if name not in _pagers or interaction.guild is None:
+        await interaction.response.send_message("⚠️ This list isn't available right now.", ephemeral=True)
+        return
+    count, _ = _pagers[name]
+    guild = interaction.guild
+    step = 1 if int(step) > 0 else -1
+    total = max(1, await count(guild, arg))
+    target = (int(page) + step) % total
+
+    cached = _cached_page(name, guild, arg, target, total)
+    if cached is not None:
+        await interaction.response.edit_message(embed=cached, view=pager_view(name, arg, target, total))
+    else:
+        # Rendering may need API calls; ack first so the interaction doesn't time out
+        await interaction.response.defer()
+        embed = await get_page(name, guild, arg, target, total)
+        await interaction.edit_original_response(embed=embed, view=pager_view(name, arg, target, total))
+    prefetch_page(name, guild, arg, target + step, total)
+
+
+register_route("page", _handle_page)
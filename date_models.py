@@ -0,0 +1,359 @@
+# date_models.py
+#
+# In-memory models for the e-date game, one instance per guild.
+
+from array import array
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+DATE_REQUEST_TTL_DAYS = 2  # today and yesterday stay answerable; older buckets expire
+
+
+class DateRequestIndex:
+    """
+    Pending date requests for one guild.
+
+    Requests live in per-day buckets (day -> sender -> receivers), so a
+    sender's requests are a lookup per live day. A reverse index
+    (receiver -> sender -> days) takes dateyes/dateno straight to the
+    buckets holding that pair's requests. Buckets older than
+    DATE_REQUEST_TTL_DAYS are dropped the first time the index is touched on a
+    new day.
+    """
+
+    __slots__ = ("_days", "_by_receiver", "_rolled_to")
+
+    def __init__(self):
+        self._days: Dict[str, Dict[str, Dict[str, None]]] = {}
+        self._by_receiver: Dict[str, Dict[str, Set[str]]] = {}
+        self._rolled_to: Optional[int] = None  # date ordinal
+
+    def __len__(self) -> int:
+        return sum(len(receivers) for senders in self._days.values() for receivers in senders.values())
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Iterable], today: int) -> Tuple["DateRequestIndex", Set[str]]:
+        """Build from the stored {sender: [[receiver, day], ...]} shape. Also returns senders that had expired entries."""
+        index = cls()
+        for sender_id, requests in payload.items():
+            for receiver_id, day in requests:
+                index.add(sender_id, receiver_id, day)
+        return index, index.roll(today)
+
+    # ---------- queries ----------
+    def sent_by(self, sender_id: str) -> List[List[str]]:
+        """Stored shape for one sender, oldest day first."""
+        return [
+            [receiver_id, day]
+            for day in sorted(self._days)
+            for receiver_id in self._days[day].get(sender_id, ())
+        ]
+
+    # ---------- updates ----------
+    def add(self, sender_id: str, receiver_id: str, day: str):
+        self._days.setdefault(day, {}).setdefault(sender_id, {})[receiver_id] = None
+        self._by_receiver.setdefault(receiver_id, {}).setdefault(sender_id, set()).add(day)
+
+    def remove(self, sender_id: str, receiver_id: str) -> bool:
+        """Drop every open request from sender to receiver. Returns False if there was none."""
+        received = self._by_receiver.get(receiver_id)
+        days = received.pop(sender_id, None) if received else None
+        if not days:
+            return False
+        if not received:
+            del self._by_receiver[receiver_id]
+        for day in days:
+            senders = self._days[day]
+            receivers = senders[sender_id]
+            del receivers[receiver_id]
+            if not receivers:
+                del senders[sender_id]
+            if not senders:
+                del self._days[day]
+        return True
+
+    def roll(self, today: int) -> Set[str]:
+        """Expire buckets older than the TTL. Cheap no-op unless the day (a date ordinal) changed. Returns affected senders."""
+        if self._rolled_to == today:
+            return set()
+        self._rolled_to = today
+        cutoff = date.fromordinal(today - (DATE_REQUEST_TTL_DAYS - 1)).isoformat()
+        affected: Set[str] = set()
+        for day in [d for d in self._days if d < cutoff]:
+            for sender_id, receivers in self._days.pop(day).items():
+                affected.add(sender_id)
+                for receiver_id in receivers:
+                    received = self._by_receiver[receiver_id]
+                    received[sender_id].discard(day)
+                    if not received[sender_id]:
+                        del received[sender_id]
+                        if not received:
+                            del self._by_receiver[receiver_id]
+        return affected
+
+
+class SortedBuckets:
+    """
+    A sorted list split into buckets of at most 2 * BUCKET_SIZE entries, with
+    a Fenwick tree over the bucket lengths. Inserts and removals bisect the
+    bucket maxima and shift one short bucket, and an entry's index is a
+    prefix sum over the tree, so each is O(log n) with a small constant
+    memmove instead of a shift of the whole list.
+    """
+
+    BUCKET_SIZE = 256
+
+    __slots__ = ("_buckets", "_maxes", "_tree", "_len")
+
+    def __init__(self, entries: Iterable = ()):
+        ordered = sorted(entries)
+        size = self.BUCKET_SIZE
+        self._buckets: List[list] = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+        self._maxes: List = [bucket[-1] for bucket in self._buckets]
+        self._len = len(ordered)
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _rebuild(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _grow(self, bucket: int, delta: int):
+        i = bucket + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _before(self, bucket: int) -> int:
+        """Number of entries in the buckets ahead of `bucket`."""
+        total = 0
+        while bucket:
+            total += self._tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """(bucket, position) of the entry at a 0-based index."""
+        bucket, step = 0, 1 << len(self._tree).bit_length()
+        while step:
+            nxt = bucket + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                bucket = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return bucket, index
+
+    def add(self, entry):
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([entry])
+            self._maxes.append(entry)
+            self._rebuild()
+            return
+        i = bisect_left(self._maxes, entry)
+        if i == len(self._maxes):
+            i -= 1
+            self._buckets[i].append(entry)
+            self._maxes[i] = entry
+        else:
+            insort(self._buckets[i], entry)
+        bucket = self._buckets[i]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = self.BUCKET_SIZE
+            self._buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild()  # once per BUCKET_SIZE inserts at most
+        else:
+            self._grow(i, 1)
+
+    def remove(self, entry):
+        """Remove an entry that is known to be present."""
+        i = bisect_left(self._maxes, entry)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, entry)]
+        self._len -= 1
+        if not bucket:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild()
+        else:
+            self._maxes[i] = bucket[-1]
+            self._grow(i, -1)
+
+    def index(self, entry) -> int:
+        """0-based position of an entry that is known to be present."""
+        i = bisect_left(self._maxes, entry)
+        return self._before(i) + bisect_left(self._buckets[i], entry)
+
+    def slice(self, start: int, count: int) -> list:
+        if start >= self._len or count <= 0:
+            return []
+        i, j = self._locate(start)
+        out: list = []
+        while i < len(self._buckets) and len(out) < count:
+            out.extend(self._buckets[i][j:j + count - len(out)])
+            i, j = i + 1, 0
+        return out
+
+
+class RankedLeaderboard:
+    """
+    Scores for one guild, kept in rank order as it changes.
+
+    Entries sit in a SortedBuckets ordered by (-score, user_id), so a point
+    bump, a user's rank and the start of a page are all O(log n), and pages
+    are read straight out of the buckets without re-sorting the board.
+    """
+
+    __slots__ = ("_scores", "_ranked")
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}
+        self._ranked = SortedBuckets()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._scores
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, int]) -> "RankedLeaderboard":
+        board = cls()
+        board._scores = {user_id: int(score) for user_id, score in payload.items()}
+        board._ranked = SortedBuckets((-score, user_id) for user_id, score in board._scores.items())
+        return board
+
+    def score(self, user_id: str) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: str, score: int) -> int:
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._ranked.add((-score, user_id))
+        return score
+
+    def add(self, user_id: str, points: int = 1) -> int:
+        return self.set(user_id, self._scores.get(user_id, 0) + points)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based position on the board, or None if the user has no score."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._ranked.index((-score, user_id)) + 1
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[int, str, int]]:
+        """(rank, user_id, score) for ranks offset+1 .. offset+k."""
+        return [
+            (offset + i + 1, user_id, -neg_score)
+            for i, (neg_score, user_id) in enumerate(self._ranked.slice(offset, k))
+        ]
+
+    def around(self, rank: int, radius: int = 2) -> List[Tuple[int, str, int]]:
+        """Entries within `radius` places of a 1-based rank."""
+        start = max(0, rank - 1 - radius)
+        return self.top(rank - start + radius, offset=start)
+
+
+class UserHistory:
+    """
+    One user's e-date history stored column-wise: partner ids in an int64
+    array, matched flags in a bytearray and reasons as indexes into the
+    guild's interned reason table (0 means no reason). Iterating yields the
+    same (partner_id, matched, reason) tuples the old list held.
+    """
+
+    __slots__ = ("_reasons", "partners", "matched", "reason_ids")
+
+    def __init__(self, reasons: "ReasonTable"):
+        self._reasons = reasons
+        self.partners = array("q")
+        self.matched = bytearray()
+        self.reason_ids = array("I")
+
+    def __len__(self) -> int:
+        return len(self.partners)
+
+    def __iter__(self) -> Iterator[Tuple[int, bool, str]]:
+        lookup = self._reasons.strings
+        for partner_id, matched, reason_id in zip(self.partners, self.matched, self.reason_ids):
+            yield partner_id, bool(matched), lookup[reason_id]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.partners[index], bool(self.matched[index]), self._reasons.strings[self.reason_ids[index]]
+
+    def append(self, record: Tuple[int, bool, Optional[str]]):
+        partner_id, matched, reason = record
+        self.partners.append(int(partner_id))
+        self.matched.append(1 if matched else 0)
+        self.reason_ids.append(self._reasons.intern(reason))
+
+    def extend_from_payload(self, entries: Iterable):
+        for entry in entries or ():
+            partner_id, matched, *rest = entry
+            self.append((partner_id, matched, rest[0] if rest else None))
+
+    def to_payload(self) -> List[list]:
+        """Stored shape: [partner_id, matched, reason] or [partner_id, matched] when there's no reason."""
+        lookup = self._reasons.strings
+        return [
+            [partner_id, bool(matched), lookup[reason_id]] if reason_id else [partner_id, bool(matched)]
+            for partner_id, matched, reason_id in zip(self.partners, self.matched, self.reason_ids)
+        ]
+
+
+class ReasonTable:
+    """Deduplicated reason strings for one guild. Index 0 is the empty reason."""
+
+    __slots__ = ("strings", "_ids")
+
+    def __init__(self):
+        self.strings: List[str] = [""]
+        self._ids: Dict[str, int] = {"": 0}
+
+    def intern(self, reason: Optional[str]) -> int:
+        if not reason:
+            return 0
+        reason_id = self._ids.get(reason)
+        if reason_id is None:
+            reason_id = self._ids[reason] = len(self.strings)
+            self.strings.append(reason)
+        return reason_id
+
+
+class GuildHistory:
+    """Per-user histories for one guild, sharing a single reason table."""
+
+    __slots__ = ("reasons", "users")
+
+    def __init__(self):
+        self.reasons = ReasonTable()
+        self.users: Dict[str, UserHistory] = {}
+
+    def __len__(self) -> int:
+        return sum(len(user) for user in self.users.values())
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    def get(self, user_id: str) -> Optional[UserHistory]:
+        return self.users.get(user_id)
+
+    def load_user(self, user_id: str, entries: Iterable) -> UserHistory:
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserHistory(self.reasons)
+            user.extend_from_payload(entries)
+        return user
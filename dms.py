@@ -0,0 +1,117 @@
+# dms.py
+#
+# One router for every DM the bot acts on. Features register a DM action
+# (the command that starts it, a usage hint and a handler) and keep an
+# in-memory index of which users have that action pending in which guilds:
+# a MyDay entry, a campfire confession. A DM is matched to its action by its
+# first one or two words and checked against the sender's index entry, both
+# dictionary lookups, so DMs from users with nothing pending are answered at
+# once without reading any file or scanning any guild. Open actions (like
+# feedback) are accepted from anyone.
+
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import discord
+
+logger = logging.getLogger("TeamRocketBot")
+
+# handler(message, guild ids the action is pending in); None runs the message as a normal command
+DMHandler = Optional[Callable[[discord.Message, Set[str]], Awaitable[None]]]
+
+
+class DMAction:
+    __slots__ = ("name", "command", "usage", "handler", "open")
+
+    def __init__(self, name: str, command: str, usage: str, handler: DMHandler, open: bool):
+        self.name = name
+        self.command = command
+        self.usage = usage
+        self.handler = handler
+        self.open = open
+
+
+class DMRouter:
+
+    def __init__(self):
+        self._actions: Dict[str, DMAction] = {}  # name -> action
+        self._commands: Dict[str, DMAction] = {}  # ".cc confess" -> action
+        self._pending: Dict[str, Dict[str, Set[str]]] = {}  # user_id -> action name -> guild ids
+        self._bot: Optional[discord.Client] = None
+        self.stats = {"routed": 0, "rejected": 0, "failed": 0}
+
+    # ---------- actions ----------
+    def register(self, name: str, command: str, usage: str, handler: DMHandler = None, open: bool = False):
+        self.unregister(name)
+        action = self._actions[name] = DMAction(name, command.lower(), usage, handler, open)
+        self._commands[action.command] = action
+
+    def unregister(self, name: str):
+        action = self._actions.pop(name, None)
+        if action is not None:
+            self._commands.pop(action.command, None)
+
+    # ---------- pending index ----------
+    def add(self, user_id: str, name: str, guild_id: str):
+        self._pending.setdefault(user_id, {}).setdefault(name, set()).add(guild_id)
+
+    def discard(self, user_id: str, name: str, guild_id: Optional[str] = None):
+        """Drop a pending action for one guild, or for all of them."""
+        actions = self._pending.get(user_id)
+        if not actions or name not in actions:
+            return
+        if guild_id is not None:
+            actions[name].discard(guild_id)
+        if guild_id is None or not actions[name]:
+            del actions[name]
+        if not actions:
+            del self._pending[user_id]
+
+    def pending(self, user_id: str, name: str) -> Set[str]:
+        return self._pending.get(user_id, {}).get(name, set())
+
+    # ---------- routing ----------
+    def _match(self, content: str) -> Optional[DMAction]:
+        words = content.lower().split(maxsplit=2)
+        if not words:
+            return None
+        return self._commands.get(" ".join(words[:2])) or self._commands.get(words[0])
+
+    def _hint(self, user_id: str) -> str:
+        waiting = [self._actions[name].usage for name in self._pending.get(user_id, {}) if name in self._actions]
+        waiting += [action.usage for action in self._actions.values() if action.open]
+        return "\n".join(f"• {usage}" for usage in waiting)
+
+    async def route(self, message: discord.Message):
+        user_id = str(message.author.id)
+        action = self._match(message.content)
+        guild_ids = self.pending(user_id, action.name) if action else set()
+
+        if action is None or not (action.open or guild_ids):
+            self.stats["rejected"] += 1
+            if user_id in self._pending:
+                text = "❌ That's not something I'm waiting on from you. You can DM me:\n"
+            else:
+                text = "📭 Nothing is waiting on you right now. You can DM me:\n"
+            await message.channel.send(text + self._hint(user_id))
+            return
+
+        self.stats["routed"] += 1
+        try:
+            if action.handler is None:
+                await self._bot.process_commands(message)
+            else:
+                await action.handler(message, set(guild_ids))
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.exception(f"DM action {action.name} failed for {user_id}: {e}")
+
+    def report(self) -> Dict[str, int]:
+        return {"actions": len(self._actions), "pending_users": len(self._pending), **self.stats}
+
+
+dms = DMRouter()
+
+
+def setup_dms(bot: discord.Client):
+    dms._bot = bot
@@ -0,0 +1,161 @@
+# file_io.py
+#
+# Async facade for file I/O. Everything runs on one bounded thread pool so
+# the event loop (gateway heartbeats, interaction acks) never waits on disk,
+# and a per-path lock keeps reads and writes to the same file in order.
+#
+# Parsed JSON documents are cached by path, so rereading a file is a
+# dictionary lookup: no stat, no parse. Cached documents are shared and
+# read-only; callers that modify what they read ask for copy=True and get
+# their own parse of the cached bytes, or use update_json() to read, change
+# and write a file under its lock. The bot's own writes replace the cache
+# entry with a parse of what was written. Edits made outside the bot are
+# noticed by a background pass that stats cached files every
+# REVALIDATE_SECONDS, or at once with revalidate=True.
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from serialization import dumps, loads
+from storage import atomic_write
+
+IO_WORKERS = int(os.getenv("ROCKET_IO_WORKERS", "4"))
+REVALIDATE_SECONDS = float(os.getenv("ROCKET_IO_REVALIDATE_SECONDS", "5"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="rocket-io")
+_file_locks: Dict[str, asyncio.Lock] = {}
+
+# abspath -> ((mtime_ns, size), parsed document, file bytes)
+Signature = Tuple[int, int]
+_documents: Dict[str, Tuple[Signature, Any, bytes]] = {}
+_revalidator: Optional[asyncio.Task] = None
+cache_stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+
+def _lock_for(key: str) -> asyncio.Lock:
+    lock = _file_locks.get(key)
+    if lock is None:
+        lock = _file_locks[key] = asyncio.Lock()
+    return lock
+
+
+def _signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+def _read_json(path: str):
+    """(signature, bytes, parsed document), or (None, None, None) if the file is missing."""
+    # Stat before reading: if the file changes in between, the next read sees a newer signature
+    signature = _signature(path)
+    if signature is None:
+        return None, None, None
+    with open(path, "rb") as f:
+        payload = f.read()
+    return signature, payload, loads(payload)
+
+
+def _write_bytes(path: str, payload: bytes):
+    atomic_write(path, payload)
+    return _signature(path), loads(payload)
+
+
+def _stale(signatures: Dict[str, Signature]) -> List[str]:
+    return [key for key, signature in signatures.items() if _signature(key) != signature]
+
+
+async def _revalidate_forever():
+    """Drop cache entries whose file changed on disk behind the bot's back."""
+    while True:
+        await asyncio.sleep(REVALIDATE_SECONDS)
+        signatures = {key: entry[0] for key, entry in _documents.items()}
+        for key in await run_io(_stale, signatures):
+            entry = _documents.get(key)
+            if entry is not None and entry[0] == signatures[key]:  # not rewritten by us meanwhile
+                del _documents[key]
+                cache_stats["revalidated"] += 1
+
+
+def _start_revalidator():
+    global _revalidator
+    if _revalidator is None or _revalidator.done():
+        _revalidator = asyncio.get_running_loop().create_task(_revalidate_forever())
+
+
+async def read_json(path: str, default=None, *, copy: bool = False, revalidate: bool = False):
+    """
+    The parsed file, or `default` if it doesn't exist. The returned document
+    is shared with other readers and must not be modified unless copy=True.
+    revalidate=True checks the file on disk first instead of trusting the cache.
+    """
+    key = os.path.abspath(path)
+    _start_revalidator()
+    entry = _documents.get(key)
+    if entry is not None and revalidate and await run_io(_signature, key) != entry[0]:
+        entry = None
+    if entry is None:
+        async with _lock_for(key):
+            entry = _documents.get(key)  # filled while we waited for the lock
+            if entry is None or revalidate:
+                cache_stats["misses"] += 1
+                signature, payload, data = await run_io(_read_json, key)
+                if signature is None:
+                    _documents.pop(key, None)
+                    return default
+                entry = _documents[key] = (signature, data, payload)
+    else:
+        cache_stats["hits"] += 1
+    return await run_io(loads, entry[2]) if copy else entry[1]
+
+
+async def write_json(path: str, data, pretty: bool | None = None):
+    key = os.path.abspath(path)
+    # Serialize on the loop so callers can keep mutating `data` afterwards
+    payload = dumps(data) if pretty is None else dumps(data, pretty=pretty)
+    async with _lock_for(key):
+        signature, document = await run_io(_write_bytes, key, payload)
+        _documents[key] = (signature, document, payload)
+
+
+async def update_json(path: str, fn: Callable[[Any], Any], default=None):
+    """
+    Read-modify-write of a whole file: fn gets a private copy of the document
+    (`default` if the file doesn't exist) and returns the one to write. Holds
+    the file's lock throughout, so concurrent updates of one file don't lose
+    each other's changes.
+    """
+    key = os.path.abspath(path)
+    _start_revalidator()
+    async with _lock_for(key):
+        entry = _documents.get(key)
+        if entry is None:
+            cache_stats["misses"] += 1
+            signature, _, data = await run_io(_read_json, key)
+            if signature is None:
+                data = default
+        else:
+            cache_stats["hits"] += 1
+            data = await run_io(loads, entry[2])
+        data = fn(data)
+        payload = dumps(data)
+        signature, document = await run_io(_write_bytes, key, payload)
+        _documents[key] = (signature, document, payload)
+    return data
+
+
+def shutdown_io():
+    if _revalidator is not None:
+        _revalidator.cancel()
+    _executor.shutdown(wait=True)
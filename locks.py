@@ -0,0 +1,65 @@
+# locks.py
+#
+# Per-key asyncio locks for read-modify-write on shared state, taken by
+# helpers.update(). Keys are (dataset, guild_id, user_id); GUILD_WIDE as the
+# user id stands for a record that belongs to the whole guild (a campfire),
+# and a MyDay session is keyed by its day instead.
+#
+# There is no global lock: commands on different keys never wait for each
+# other. A lock only exists while someone holds or waits for it, so the table
+# is as large as the number of commands in flight. Several keys are always
+# acquired in sorted order, so two commands locking overlapping keys can't
+# deadlock. Locks are not reentrant: don't take a key you already hold.
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+
+Key = Tuple[str, str, str]
+GUILD_WIDE = "*"
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # holders and waiters
+
+
+class KeyedLocks:
+
+    def __init__(self):
+        self._entries: Dict[Key, _Entry] = {}
+        self.stats = {"acquired": 0, "contended": 0}
+
+    @asynccontextmanager
+    async def hold(self, *keys: Key):
+        """Hold the locks for all `keys` for the duration of the block."""
+        entries = []
+        for key in sorted(set(keys)):
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.users += 1
+            entries.append((key, entry))
+
+        acquired = []
+        try:
+            for _, entry in entries:
+                if entry.lock.locked():
+                    self.stats["contended"] += 1
+                await entry.lock.acquire()
+                acquired.append(entry)
+                self.stats["acquired"] += 1
+            yield
+        finally:
+            for entry in reversed(acquired):
+                entry.lock.release()
+            for key, entry in entries:
+                entry.users -= 1
+                if not entry.users:
+                    del self._entries[key]
+
+
+locks = KeyedLocks()
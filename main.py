@@ -1,11 +1,19 @@
 # main.py
 import os
+import signal
 import asyncio
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 from keep_alive import keep_alive  # optional
-from py.rocket_thread_restriction import global_thread_check, load_restrictions
+from helpers import load_data, persistence, close_data
+from components import setup_components
+from reactions import setup_reactions
+from dms import dms, setup_dms
+from timers import timers
+from clock import clock
+from asset_publisher import close_publisher
+from py.rocket_thread_restriction import ThreadRestricted
 
 # ─── Load environment ─────────────────────────────
 load_dotenv()
@@ -37,6 +45,23 @@ async def on_guild_join(guild):
             if ch.permissions_for(guild.me).send_messages:
                 await ch.send(message)
                 break
+@bot.event
+async def on_message(message):
+    if message.author.bot:
+        return
+    if message.guild is None:
+        await dms.route(message)  # DMs only run what the sender has pending (or open actions like feedback)
+        return
+    await bot.process_commands(message)
+
+# ─── Thread restrictions are a global check (see rocket_thread_restriction) ─
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, ThreadRestricted):
+        await ctx.send(str(error))
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
 # ─── Load all extensions ─────────────────────────────
 async def load_extensions():
     extensions = [
@@ -47,6 +72,7 @@ async def load_extensions():
         "py.rocket_myday",
         "py.rocket_personality_test",
         "py.rocket_drawing_date",
+        "py.rocket_thread_restriction",
     ]
     for ext in extensions:
         try:
@@ -59,6 +85,7 @@ async def load_extensions():
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
+    timers.start()  # timeouts (including ones overdue since a restart) fire once the bot can act on them
     try:
         await bot.tree.sync()
         print("✅ Slash commands synced globally")
@@ -67,8 +94,29 @@ async def on_ready():
 
 # ─── Start bot ─────────────────────────────
 async def main():
+    load_data()
+    persistence.start()
+    await timers.load()
+    await clock.load()  # guild timezones, before any cog asks for today
     await load_extensions()
+    setup_components(bot)  # one persistent handler for every routed button
+    setup_reactions(bot)  # one raw reaction listener, routed by message id
+    setup_dms(bot)
+    clock.start(bot)  # day rollovers, fired once the timer wheel runs
     keep_alive()  # optional for hosting
-    await bot.start(TOKEN)
+
+    # Hosts stop workers with SIGTERM; close cleanly so pending data gets flushed
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:
+        pass
+
+    try:
+        await bot.start(TOKEN)
+    finally:
+        await timers.close()
+        await close_publisher(bot)  # the webhook uploader's aiohttp session
+        await close_data()
+        print("💾 Pending data flushed")
 
 asyncio.run(main())
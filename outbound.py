@@ -0,0 +1,225 @@
+# outbound.py
+#
+# Outbound message scheduler. Every channel gets a queue drained by one
+# worker behind a token bucket sized a little under Discord's per-channel
+# limit, so bursts wait on our side instead of in 429 backoff.
+#
+# Queued messages are grouped by owner (usually the invoking user) and the
+# worker takes turns between owners, so one long command can't starve the
+# rest of the channel. Consecutive plain-text messages from the same owner
+# are merged into one message while they fit in Discord's 2000 characters.
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional
+
+import discord
+
+logger = logging.getLogger("TeamRocketBot")
+
+MESSAGE_LIMIT = 2000  # characters in message content
+EMBED_DESCRIPTION_LIMIT = 4096  # characters in an embed description
+CHANNEL_BURST = int(os.getenv("ROCKET_CHANNEL_BURST", "4"))  # messages sent back to back
+CHANNEL_RATE = float(os.getenv("ROCKET_CHANNEL_RATE", "0.8"))  # messages per second after a burst
+COMMAND_MESSAGE_CAP = int(os.getenv("ROCKET_COMMAND_MESSAGE_CAP", "5"))  # messages one send_many may post
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: int = CHANNEL_BURST, rate: float = CHANNEL_RATE):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+    def time_until_full(self) -> float:
+        self._refill()
+        return (self.capacity - self.tokens) / self.rate
+
+
+class _Outgoing:
+    __slots__ = ("destination", "content", "kwargs", "future")
+
+    def __init__(self, destination: discord.abc.Messageable, content: Optional[str], kwargs: Dict[str, Any]):
+        self.destination = destination
+        self.content = content
+        self.kwargs = kwargs
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def mergeable(self) -> bool:
+        return bool(self.content) and not self.kwargs
+
+
+class _ChannelQueue:
+    __slots__ = ("bucket", "owners", "worker", "wakeup")
+
+    def __init__(self):
+        self.bucket = TokenBucket()
+        self.wakeup = asyncio.Event()
+        self.owners: "OrderedDict[Hashable, Deque[_Outgoing]]" = OrderedDict()
+        self.worker: Optional[asyncio.Task] = None
+
+    def next_batch(self) -> List[_Outgoing]:
+        """Oldest message of the next owner in turn, plus whatever of theirs can be merged into it."""
+        owner, pending = next(iter(self.owners.items()))
+        batch = [pending.popleft()]
+        if batch[0].mergeable:
+            size = len(batch[0].content)
+            while pending and pending[0].mergeable and size + 1 + len(pending[0].content) <= MESSAGE_LIMIT:
+                size += 1 + len(pending[0].content)
+                batch.append(pending.popleft())
+        if pending:
+            self.owners.move_to_end(owner)
+        else:
+            del self.owners[owner]
+        return batch
+
+
+def _channel_key(destination) -> Hashable:
+    channel = getattr(destination, "channel", destination)
+    return getattr(channel, "id", id(channel))
+
+
+def pack_lines(lines: Iterable[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Join lines into as few chunks under `limit` as possible. Overlong lines are split."""
+    chunks: List[str] = []
+    current = ""
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class OutboundScheduler:
+
+    def __init__(self):
+        self._channels: Dict[Hashable, _ChannelQueue] = {}
+        self.stats = {"queued": 0, "sent": 0, "merged": 0, "trimmed": 0}
+
+    async def send(self, destination: discord.abc.Messageable, content: Optional[str] = None, *,
+                   owner: Hashable = None, **kwargs) -> discord.Message:
+        """
+        Queue a message for `destination` (a channel or Context) and wait until
+        it is sent. Merged messages resolve to the same discord.Message.
+        """
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        outgoing = _Outgoing(destination, content, kwargs)
+        key = _channel_key(destination)
+        queue = self._channels.get(key)
+        if queue is None:
+            queue = self._channels[key] = _ChannelQueue()
+        queue.owners.setdefault(owner, deque()).append(outgoing)
+        self.stats["queued"] += 1
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(key, queue))
+        else:
+            queue.wakeup.set()
+        return await outgoing.future
+
+    async def send_many(self, destination: discord.abc.Messageable, lines: Iterable[str], *,
+                        owner: Hashable = None, embed: Optional[discord.Embed] = None,
+                        cap: int = COMMAND_MESSAGE_CAP) -> List[discord.Message]:
+        """
+        Post a run of lines as few messages as possible, at most `cap` of them.
+        With `embed`, lines fill copies of it as descriptions (4096 characters
+        each) instead of plain messages. Anything past the cap is dropped with a note.
+        Raises ValueError if cap is below 1.
+        """
+        if cap < 1:
+            raise ValueError(f"send_many cap must be at least 1, got {cap}")
+        limit = EMBED_DESCRIPTION_LIMIT if embed else MESSAGE_LIMIT
+        chunks = pack_lines(lines, limit)
+        if len(chunks) > cap:
+            dropped = sum(chunk.count("\n") + 1 for chunk in chunks[cap:])
+            self.stats["trimmed"] += dropped
+            chunks = chunks[:cap]
+            note = f"\n… ({dropped} more lines trimmed)"
+            chunks[-1] = chunks[-1][:limit - len(note)] + note
+
+        if embed is None:
+            sends = [self.send(destination, chunk, owner=owner) for chunk in chunks]
+        else:
+            sends = []
+            for chunk in chunks:
+                page = embed.copy()
+                page.description = chunk
+                sends.append(self.send(destination, owner=owner, embed=page))
+        return list(await asyncio.gather(*sends))
+
+    async def _drain(self, key: Hashable, queue: _ChannelQueue):
+        try:
+            while True:
+                while queue.owners:
+                    await queue.bucket.acquire()
+                    batch = queue.next_batch()
+                    await self._deliver(batch)
+                # Stay around until the bucket refills, so a new burst can't skip the rate limit
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), queue.bucket.time_until_full())
+                except asyncio.TimeoutError:
+                    if not queue.owners:
+                        break
+        finally:
+            # Only reached with messages left if the worker was cancelled (shutdown)
+            for pending in queue.owners.values():
+                for item in pending:
+                    item.future.cancel()
+            queue.owners.clear()
+            if self._channels.get(key) is queue:
+                del self._channels[key]
+
+    async def _deliver(self, batch: List[_Outgoing]):
+        first = batch[0]
+        destination = first.destination
+        content = "\n".join(item.content for item in batch) if len(batch) > 1 else first.content
+        try:
+            message = await destination.send(content=content, **first.kwargs)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+                    # Callers that gave up waiting shouldn't trigger "exception never retrieved"
+                    item.future.exception()
+            if not isinstance(e, discord.Forbidden):
+                logger.error(f"Outbound send to {_channel_key(destination)} failed: {e}")
+            return
+        self.stats["sent"] += 1
+        self.stats["merged"] += len(batch) - 1
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(message)
+
+    def pending(self) -> int:
+        return sum(len(q) for queue in self._channels.values() for q in queue.owners.values())
+
+
+outbound = OutboundScheduler()
@@ -0,0 +1,94 @@
+# pokemon_models.py
+#
+# In-memory models for the pokemon pet game.
+
+from typing import Dict, Iterable, List, Optional
+
+MAX_PROGRESS = 5  # walks, feeds and wins that count towards the level
+MAX_LEVEL = 5
+
+
+class SpeciesIndex:
+    """rocket_pokemon_list.json indexed by species id, built once at cog load."""
+
+    __slots__ = ("species", "_by_id")
+
+    def __init__(self, species: Iterable[dict]):
+        self.species: List[dict] = list(species)
+        self._by_id: Dict[str, dict] = {entry["id"]: entry for entry in self.species}
+
+    def __len__(self) -> int:
+        return len(self.species)
+
+    def get(self, species_id: str) -> Optional[dict]:
+        return self._by_id.get(species_id)
+
+
+class Pokemon:
+    """
+    One owner's pokemon. Stored in the same shape as the old owners file;
+    the level is derived from walks, feeds and wins whenever it is read, so
+    showing a pokemon never has to write anything back.
+    """
+
+    __slots__ = ("species_id", "name", "walks", "feeds", "wins", "losses", "asset", "evolution_asset")
+
+    def __init__(self, species_id: str, name: str = "UNKNOWN", walks: int = 0, feeds: int = 0,
+                 wins: int = 0, losses: int = 0, asset: str = "", evolution_asset: str = ""):
+        self.species_id = species_id
+        self.name = name
+        self.walks = walks
+        self.feeds = feeds
+        self.wins = wins
+        self.losses = losses
+        self.asset = asset
+        self.evolution_asset = evolution_asset
+
+    @classmethod
+    def caught(cls, species: dict) -> "Pokemon":
+        return cls(species["id"], asset=species["asset"]["main"], evolution_asset=species["asset"]["evolution"])
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Pokemon":
+        battle = payload.get("battle") or {}
+        return cls(
+            payload["rocket_pokemon"],
+            name=payload.get("name", "UNKNOWN"),
+            walks=payload.get("walks", 0),
+            feeds=payload.get("feeds", 0),
+            wins=battle.get("win", 0),
+            losses=battle.get("loss", 0),
+            asset=payload.get("asset", ""),
+            evolution_asset=payload.get("evolution_asset", ""),
+        )
+
+    def to_payload(self) -> dict:
+        return {
+            "rocket_pokemon": self.species_id,
+            "name": self.name,
+            "level": self.level,
+            "walks": self.walks,
+            "feeds": self.feeds,
+            "battle": {"win": self.wins, "loss": self.losses},
+            "asset": self.asset,
+            "evolution_asset": self.evolution_asset,
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Pokemon):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def copy(self) -> "Pokemon":
+        return Pokemon(self.species_id, self.name, self.walks, self.feeds, self.wins, self.losses,
+                       self.asset, self.evolution_asset)
+
+    @property
+    def named(self) -> bool:
+        return self.name != "UNKNOWN"
+
+    @property
+    def level(self) -> int:
+        """Average completion of walks, feeds and wins, scaled to 1..MAX_LEVEL."""
+        progress = sum(min(value, MAX_PROGRESS) for value in (self.walks, self.feeds, self.wins))
+        return max(1, min(MAX_LEVEL, round(progress / (3 * MAX_PROGRESS) * MAX_LEVEL)))
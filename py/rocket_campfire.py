@@ -1,47 +1,78 @@
 import discord
 from discord.ext import commands
-import datetime
-import json
-import os
 import random
-import asyncio
+from resolver import get_resolver
+from asset_publisher import get_publisher
+from helpers import update, register_updatable, unregister_updatable
+from locks import GUILD_WIDE
+from timers import timers
+from reactions import reactions
+from dms import dms
+from clock import clock
+from campfire_state import campfires, Campfire, LIT, GATHERING, AWAITING_CONFESSION, COLLECTING_REACTIONS, CLOSED
 
 MAX_CAMPERS = 2
 CONFESS_TIMEOUT = 300  # 5 minutes
 
 
-def load_json_file(filename, default=None):
-    if not os.path.exists(filename):
-        return default if default is not None else {}
-    with open(filename, "r") as f:
-        return json.load(f)
-
-
-def save_json_file(filename, data):
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
-
-
-def get_today():
-    return datetime.datetime.utcnow().date().isoformat()
-
-
 class RocketCampfire(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.file = "json/rocket_campfire.json"
-        self.timeouts = {}  # guild_id -> asyncio.Task
-        self.active_threads = {}  # guild_id -> thread_id
 
-    def get_campfire(self, guild_id: str):
-        data = load_json_file(self.file, {})
-        return data.get(guild_id)
-
-    def save_campfire(self, guild_id: str, record: dict):
-        data = load_json_file(self.file, {})
-        data[guild_id] = record
-        save_json_file(self.file, data)
+    async def cog_load(self):
+        await campfires.recover()
+        register_updatable("campfire", self.current, self.store)
+        timers.register("campfire_confess", self.confess_timed_out)
+        timers.register("campfire_reactions", self.reactions_timed_out)
+        dms.register("confess", ".cc confess", "`.cc confess <yes/no> <message>` — your campfire confession")
+        clock.on_rollover("campfire", self.close_stale)
+        # Confessions still collecting reactions when the bot went down keep collecting
+        for campfire in campfires.campfires.values():
+            if campfire.phase == COLLECTING_REACTIONS and campfire.confession_msg_id:
+                reactions.register(campfire.confession_msg_id, self.on_confession_reaction)
+            elif campfire.phase == AWAITING_CONFESSION:
+                dms.add(campfire.chosen_id, "confess", campfire.guild_id)
+
+    async def cog_unload(self):
+        unregister_updatable("campfire")
+        timers.unregister("campfire_confess")
+        timers.unregister("campfire_reactions")
+        dms.unregister("confess")
+        clock.remove_rollover("campfire")
+        for campfire in campfires.campfires.values():
+            if campfire.confession_msg_id:
+                reactions.unregister(campfire.confession_msg_id or 0)
+        await campfires.flush()
+
+    @staticmethod
+    def key(guild_id: str):
+        """update() key of a guild's campfire; every check-then-transition goes through it."""
+        return "campfire", guild_id, GUILD_WIDE
+
+    @staticmethod
+    async def current(guild_id: str, _user_id: str):
+        return campfires.get(guild_id), campfires.draft(guild_id)
+
+    @staticmethod
+    async def store(_guild_id: str, _user_id: str, draft: Campfire):
+        await campfires.commit(draft)
+
+    def describe(self, guild: discord.Guild, campfire: Campfire):
+        """Display strings for campers, confession sender and reactions."""
+        def name(user_id):
+            member = guild.get_member(int(user_id)) if guild else None
+            return member.display_name if member else None
+
+        campers_display = ", ".join(name(c_id) or f"<@{c_id}>" for c_id in campfire.campers)
+        sender_display = "Anonymous"
+        if campfire.public and campfire.chosen_id:
+            sender_display = name(campfire.chosen_id) or "Unknown"
+        if campfire.reactions:
+            reaction_text = ", ".join(f"{name(user_id) or user_id} {emoji}" for user_id, emoji in campfire.reactions.entries)
+        else:
+            reaction_text = "No reactions yet."
+        return campers_display, sender_display, reaction_text
 
     # ── Base command
     @commands.group(name="cc", invoke_without_command=True)
@@ -58,42 +89,37 @@ class RocketCampfire(commands.Cog):
     @cc.command(name="lit")
     async def cc_lit(self, ctx):
         guild_id = str(ctx.guild.id)
-        today = get_today()
-
-        data = load_json_file(self.file, {})
-        record = data.get(guild_id)
-
-        if record:
-            last_reset = record.get("last_reset")
-            if last_reset == today:
-                if record.get("active"):
-                    await ctx.send("❌ Campfire already active today! Cannot lit again.")
-                    return
-                if record.get("campers") and record.get("confession_message"):
-                    await ctx.send("❌ Today's campfire already ended. Wait until tomorrow!")
-                    return
-
-        record = {
-            "campers": [],
-            "starter_camper": str(ctx.author.id),
-            "chosen_camper": None,
-            "confession_message": None,
-            "active": True,
-            "reactions": [],
-            "isPublic": None,
-            "thread_id": None,
-            "starter_camper_channel_id": ctx.channel.id,
-            "last_reset": today,
-            "confession_msg_id": None
-        }
-        self.save_campfire(guild_id, record)
+        starter_id = str(ctx.author.id)
+        today = clock.today(guild_id)
+        day = clock.day(guild_id)
+        refusal = None
+        replaced = None
+
+        def light(campfire: Campfire) -> Campfire:
+            nonlocal refusal, replaced
+            if campfire.ordinal == day:
+                if campfire.active:
+                    refusal = "❌ Campfire already active today! Cannot lit again."
+                    return campfire
+                if campfire.campers and campfire.confessed:
+                    refusal = "❌ Today's campfire already ended. Wait until tomorrow!"
+                    return campfire
+            if campfire.phase not in (None, CLOSED):
+                replaced = campfires.get(guild_id)
+                campfire.transition("closed", reason="relit")
+            return campfire.transition("lit", day=today, starter=starter_id, channel=ctx.channel.id)
+        await update(self.key(guild_id), light)
+        if replaced:
+            self.put_out(replaced)
+        if refusal:
+            await ctx.send(refusal)
+            return
 
         try:
-            file = discord.File("assets/campfire.gif", filename="campfire.gif")
             embed = discord.Embed(
                 description=f"🔥 {ctx.author.display_name} lit the campfire! Waiting for campers to join... (max {MAX_CAMPERS})",
                 color=discord.Color.orange())
-            embed.set_image(url="attachment://campfire.gif")
+            file = await get_publisher(self.bot).image(embed, "assets/campfire.gif", "campfire.gif")
             main_msg = await ctx.send(embed=embed, file=file)
         except:
             embed = discord.Embed(
@@ -109,8 +135,7 @@ class RocketCampfire(commands.Cog):
                     name=thread_name,
                     auto_archive_duration=60,
                     reason="Campfire thread for today")
-                record["thread_id"] = thread.id
-                self.save_campfire(guild_id, record)
+                await self.set_thread(guild_id, starter_id, thread.id)
                 await thread.send(
                     f"🔥 {ctx.author.display_name} lit the campfire! Join using `.cc join` to participate."
                 )
@@ -118,42 +143,81 @@ class RocketCampfire(commands.Cog):
                 await ctx.send(f"⚠️ Could not create campfire thread: {e}")
         else:
             # Already inside a thread
-            record["thread_id"] = ctx.channel.id
-            self.save_campfire(guild_id, record)
+            await self.set_thread(guild_id, starter_id, ctx.channel.id)
             await ctx.send(
                 f"🔥 {ctx.author.display_name} lit the campfire inside this thread! Join using `.cc join` to participate."
             )
 
+    async def close_stale(self, guilds: dict):
+        """Day rollover: put out yesterday's campfires nobody got going. Confessions in flight finish on their timers."""
+        for guild_id in guilds:
+            day = clock.day(guild_id)
+            campfire = campfires.get(guild_id)
+            if not campfire or campfire.ordinal == day or campfire.phase not in (LIT, GATHERING):
+                continue
+
+            def put_out(campfire: Campfire, day=day) -> Campfire:
+                if campfire.ordinal != day and campfire.phase in (LIT, GATHERING):
+                    campfire.transition("closed", reason="stale")
+                return campfire
+            await update(self.key(guild_id), put_out)
+
+    @staticmethod
+    def forget_chosen(campfire: Campfire):
+        """The chosen camper no longer has a confession pending in DMs."""
+        if campfire.chosen_id:
+            dms.discard(campfire.chosen_id, "confess", campfire.guild_id)
+
+    def put_out(self, campfire: Campfire):
+        """Drop the pending confession, timer and reaction route of a campfire that was just replaced."""
+        self.forget_chosen(campfire)
+        timers.cancel(f"campfire:{campfire.guild_id}")
+        reactions.unregister(campfire.confession_msg_id or 0)
+
+    async def set_thread(self, guild_id: str, starter_id: str, thread_id: int):
+        def attach(campfire: Campfire) -> Campfire:
+            # Skipped if the campfire was reset or closed while the thread was being created
+            if campfire.phase not in (None, CLOSED) and campfire.starter_id == starter_id and campfire.thread_id is None:
+                campfire.transition("thread", thread=thread_id)
+            return campfire
+        await update(self.key(guild_id), attach)
+
     # ── .cc join ──
     @cc.command(name="join")
     async def cc_join(self, ctx):
         guild_id = str(ctx.guild.id)
-        record = self.get_campfire(guild_id)
-
-        if not record or not record.get("active"):
-            await ctx.send("❌ No active campfire. Use `.cc lit` to start one.")
-            return
-
-        campers = record.get("campers", [])
         user_id = str(ctx.author.id)
 
-        if user_id in campers:
-            await ctx.send("❌ You already joined this campfire.")
+        refusal = None
+        chosen = None
+        count = 0
+
+        def join(campfire: Campfire) -> Campfire:
+            nonlocal refusal, chosen, count
+            if not campfire.active:
+                refusal = "❌ No active campfire. Use `.cc lit` to start one."
+            elif user_id in campfire.campers:
+                refusal = "❌ You already joined this campfire."
+            elif len(campfire.campers) >= MAX_CAMPERS:
+                refusal = "⚠️ Campfire is full. Cannot join."
+            else:
+                campfire.transition("join", user=user_id)
+                count = len(campfire.campers)
+                if count == MAX_CAMPERS and not campfire.chosen_id:
+                    chosen = random.choice(campfire.campers)
+                    campfire.transition("chosen", user=chosen)
+            return campfire
+        # Two joins racing for the last seat are applied one after the other
+        await update(self.key(guild_id), join)
+        if chosen:
+            dms.add(chosen, "confess", guild_id)
+        if refusal:
+            await ctx.send(refusal)
             return
 
-        if len(campers) >= MAX_CAMPERS:
-            await ctx.send("⚠️ Campfire is full. Cannot join.")
-            return
-
-        campers.append(user_id)
-        record["campers"] = campers
-        self.save_campfire(guild_id, record)
-        await ctx.send(f"✅ {ctx.author.display_name} joined the campfire! ({len(campers)}/{MAX_CAMPERS})")
+        await ctx.send(f"✅ {ctx.author.display_name} joined the campfire! ({count}/{MAX_CAMPERS})")
 
-        if len(campers) == MAX_CAMPERS and not record.get("chosen_camper"):
-            chosen = random.choice(campers)
-            record["chosen_camper"] = chosen
-            self.save_campfire(guild_id, record)
+        if chosen:
             member = ctx.guild.get_member(int(chosen))
             if member:
                 try:
@@ -165,17 +229,24 @@ class RocketCampfire(commands.Cog):
                     pass
 
             # Start timeout
-            async def timeout_task():
-                await asyncio.sleep(CONFESS_TIMEOUT)
-                r = self.get_campfire(guild_id)
-                if r.get("active") and r.get("chosen_camper"):
-                    r["active"] = False
-                    r["chosen_camper"] = None
-                    self.save_campfire(guild_id, r)
-                    thread = ctx.guild.get_channel(record.get("thread_id")) or ctx.channel
-                    await thread.send("⏰ Chosen camper did not confess in time. Campfire ended due to inactivity.")
-
-            self.timeouts[guild_id] = self.bot.loop.create_task(timeout_task())
+            timers.schedule(f"campfire:{guild_id}", CONFESS_TIMEOUT, "campfire_confess", guild=guild_id, chosen=chosen)
+
+    async def confess_timed_out(self, _key: str, payload: dict):
+        guild_id = payload["guild"]
+        expired = None
+
+        def expire(campfire: Campfire) -> Campfire:
+            nonlocal expired
+            if campfire.phase == AWAITING_CONFESSION and campfire.chosen_id == payload["chosen"]:
+                expired = campfires.get(guild_id)
+                campfire.transition("closed", reason="timeout")
+            return campfire
+        await update(self.key(guild_id), expire)
+        if expired:
+            self.forget_chosen(expired)
+            thread = await get_resolver(self.bot).channel(expired.thread_id or expired.channel_id)
+            if thread:
+                await thread.send("⏰ Chosen camper did not confess in time. Campfire ended due to inactivity.")
 
     # ── .cc confess ──
     @cc.command(name="confess")
@@ -189,56 +260,53 @@ class RocketCampfire(commands.Cog):
             return
 
         user_id = str(ctx.author.id)
-
-        # Find active campfire
-        data = load_json_file(self.file, {})
-        guild_id, record = None, None
-        for g_id, r in data.items():
-            if r.get("active") and r.get("chosen_camper") == user_id:
-                guild_id = g_id
-                record = r
-                break
-
-        if not record:
+        campfire = campfires.awaiting_confession_from(user_id)
+        if not campfire:
             await ctx.author.send("❌ You are not the chosen camper in any active campfire.")
             return
+        guild_id = campfire.guild_id
+        problem = None
 
-        guild = self.bot.get_guild(int(guild_id))
-        thread = None
+        async def confess(campfire: Campfire) -> Campfire:
+            nonlocal problem
+            if campfire.phase != AWAITING_CONFESSION or campfire.chosen_id != user_id:
+                problem = "❌ You are not the chosen camper in any active campfire."
+                return campfire
 
-        # Prioritize active thread
-        thread_id = record.get("thread_id")
-        if thread_id:
-            try:
-                thread = await self.bot.fetch_channel(thread_id)
+            guild = self.bot.get_guild(int(guild_id))
+            thread = None
+
+            # Prioritize active thread
+            if campfire.thread_id:
+                thread = await get_resolver(self.bot).channel(campfire.thread_id)
                 if getattr(thread, "archived", False):
                     thread = None
-            except:
-                thread = None
-
-        # Fallback to starter channel
-        if not thread:
-            starter_channel_id = record.get("starter_camper_channel_id")
-            thread = guild.get_channel(starter_channel_id)
 
-        if not thread:
-            await ctx.author.send("❌ Could not find a channel to post confession.")
-            return
+            # Fallback to starter channel
+            if not thread and guild:
+                thread = guild.get_channel(campfire.channel_id)
 
-        sender_text = ctx.author.display_name if anon.lower() == "yes" else "Anonymous"
-        confess_msg = await thread.send(
-            f"💌 {sender_text} confessed!\n"
-            f"💬 {message}\n"
-            "Whoa, campers! React to this shocking confession 😳🔥 Hit it with your emoji vibes 💥💌"
-        )
+            if not thread:
+                problem = "❌ Could not find a channel to post confession."
+                return campfire
 
-        record["confession_message"] = message
-        record["active"] = False
-        record["chosen_camper"] = None
-        record["isPublic"] = "yes" if anon.lower() == "yes" else "no"
-        record["confession_msg_id"] = confess_msg.id
-        record["reactions"] = []
-        self.save_campfire(guild_id, record)
+            sender_text = ctx.author.display_name if anon.lower() == "yes" else "Anonymous"
+            confess_msg = await thread.send(
+                f"💌 {sender_text} confessed!\n"
+                f"💬 {message}\n"
+                "Whoa, campers! React to this shocking confession 😳🔥 Hit it with your emoji vibes 💥💌"
+            )
+            return campfire.transition("confessed", message=message, public=anon.lower() == "yes",
+                                       message_id=confess_msg.id)
+        # Posted and recorded as one update, so a repeated confess or the timeout can't interleave
+        await update(self.key(guild_id), confess)
+        if problem:
+            await ctx.author.send(problem)
+            return
+        confessed = campfires.get(guild_id)
+        self.forget_chosen(confessed)
+        reactions.register(confessed.confession_msg_id, self.on_confession_reaction)
+        timers.schedule(f"campfire:{guild_id}", CONFESS_TIMEOUT, "campfire_reactions", guild=guild_id)
 
         await ctx.author.send(
             f"💌 Your confession has been announced in the campfire thread!\n"
@@ -246,66 +314,58 @@ class RocketCampfire(commands.Cog):
             f"Confession: {message}"
         )
 
-        async def wait_for_reactions():
-            try:
-                def check(reaction, user):
-                    return (user.id != self.bot.user.id
-                            and str(user.id) in record["campers"]
-                            and reaction.message.id == confess_msg.id)
-
-                while True:
-                    reaction, user = await self.bot.wait_for("reaction_add", timeout=CONFESS_TIMEOUT, check=check)
-                    if not any(r["user_id"] == str(user.id) for r in record["reactions"]):
-                        record["reactions"].append({
-                            "user_id": str(user.id),
-                            "emoji": str(reaction.emoji)
-                        })
-                        self.save_campfire(guild_id, record)
-
-                    if len(record["reactions"]) >= len(record.get("campers", [])):
-                        await self.post_summary(guild_id, record)
-                        break
-            except asyncio.TimeoutError:
-                await self.post_summary(guild_id, record)
-
-        self.bot.loop.create_task(wait_for_reactions())
+    async def on_confession_reaction(self, payload: discord.RawReactionActionEvent):
+        guild_id = str(payload.guild_id)
+        campfire = campfires.get(guild_id)
+        if not campfire or campfire.confession_msg_id != payload.message_id:
+            return
+        user_id = str(payload.user_id)
+        if user_id not in campfire.campers or not campfires.add_reaction(guild_id, user_id, str(payload.emoji)):
+            return
+
+        if len(campfire.reactions) >= len(campfire.campers):
+            await self.post_summary(guild_id, campfire)
+        else:
+            # The window restarts with every new reaction
+            timers.schedule(f"campfire:{guild_id}", CONFESS_TIMEOUT, "campfire_reactions", guild=guild_id)
+
+    async def reactions_timed_out(self, _key: str, payload: dict):
+        campfire = campfires.get(payload["guild"])
+        if campfire:
+            await self.post_summary(payload["guild"], campfire)
 
     # ── Post summary ──
-    async def post_summary(self, guild_id, record):
+    async def post_summary(self, guild_id, campfire: Campfire):
+        closed = False
+
+        def close(draft: Campfire) -> Campfire:
+            nonlocal closed
+            # Only the summary for this confession, and only once
+            if draft.phase == COLLECTING_REACTIONS and draft.confession_msg_id == campfire.confession_msg_id:
+                closed = True
+                draft.transition("closed", reason="summary")
+            return draft
+        await update(self.key(guild_id), close)
+        if not closed:
+            return
+        timers.cancel(f"campfire:{guild_id}")
+        reactions.unregister(campfire.confession_msg_id or 0)
+
         guild = self.bot.get_guild(int(guild_id))
         thread = None
-        if record.get("thread_id"):
-            try:
-                thread = await self.bot.fetch_channel(record["thread_id"])
-            except:
-                pass
+        if campfire.thread_id:
+            thread = await get_resolver(self.bot).channel(campfire.thread_id)
         if not thread:
-            thread = guild.get_channel(record.get("starter_camper_channel_id"))
+            thread = guild.get_channel(campfire.channel_id)
 
-        campers_display = []
-        for c_id in record.get("campers", []):
-            member = guild.get_member(int(c_id))
-            campers_display.append(member.display_name if member else f"<@{c_id}>")
-
-        sender_display = "Anonymous"
-        if record.get("isPublic") == "yes" and record.get("starter_camper"):
-            member = guild.get_member(int(record.get("starter_camper")))
-            sender_display = member.display_name if member else "Unknown"
-
-        reactions = record.get("reactions", [])
-        if reactions:
-            reaction_text = ", ".join(
-                f"{guild.get_member(int(r['user_id'])).display_name if guild.get_member(int(r['user_id'])) else r['user_id']} {r['emoji']}"
-                for r in reactions)
-        else:
-            reaction_text = "No reactions yet."
+        campers_display, sender_display, reaction_text = self.describe(guild, campfire)
 
         embed = discord.Embed(title="🔥 Campfire Ended! Summary 🔥",
                               color=discord.Color.gold())
-        embed.add_field(name="Date", value=record.get("last_reset"), inline=False)
-        embed.add_field(name="Campers", value=", ".join(campers_display), inline=False)
+        embed.add_field(name="Date", value=campfire.day, inline=False)
+        embed.add_field(name="Campers", value=campers_display, inline=False)
         embed.add_field(name="Confession Sender", value=sender_display, inline=False)
-        embed.add_field(name="Confession Message", value=record.get("confession_message"), inline=False)
+        embed.add_field(name="Confession Message", value=campfire.confession, inline=False)
         embed.add_field(name="Reactions", value=reaction_text, inline=False)
         embed.set_footer(text="Next campfire available tomorrow!")
 
@@ -314,36 +374,18 @@ class RocketCampfire(commands.Cog):
     # ── .cc history ──
     @cc.command(name="history")
     async def cc_history(self, ctx):
-        guild_id = str(ctx.guild.id)
-        record = self.get_campfire(guild_id)
-        if not record or not record.get("confession_message"):
+        campfire = campfires.get(str(ctx.guild.id))
+        if not campfire or not campfire.confessed:
             await ctx.send("📖 No confessions today yet.")
             return
 
-        guild = ctx.guild
-        campers_display = []
-        for c_id in record.get("campers", []):
-            member = guild.get_member(int(c_id))
-            campers_display.append(member.display_name if member else f"<@{c_id}>")
-
-        sender_display = "Anonymous"
-        if record.get("isPublic") == "yes" and record.get("starter_camper"):
-            member = guild.get_member(int(record.get("starter_camper")))
-            sender_display = member.display_name if member else "Unknown"
-
-        reactions = record.get("reactions", [])
-        if reactions:
-            reaction_text = ", ".join(
-                f"{guild.get_member(int(r['user_id'])).display_name if guild.get_member(int(r['user_id'])) else r['user_id']} {r['emoji']}"
-                for r in reactions)
-        else:
-            reaction_text = "No reactions yet."
+        campers_display, sender_display, reaction_text = self.describe(ctx.guild, campfire)
 
         embed = discord.Embed(title="📖 Today's Campfire Confession",
                               color=discord.Color.orange())
-        embed.add_field(name="Campers", value=", ".join(campers_display), inline=False)
+        embed.add_field(name="Campers", value=campers_display, inline=False)
         embed.add_field(name="Confession Sender", value=sender_display, inline=False)
-        embed.add_field(name="Confession Message", value=record.get("confession_message"), inline=False)
+        embed.add_field(name="Confession Message", value=campfire.confession, inline=False)
         embed.add_field(name="Reactions", value=reaction_text, inline=False)
         await ctx.send(embed=embed)
 
@@ -351,20 +393,18 @@ class RocketCampfire(commands.Cog):
     @cc.command(name="reset")
     async def cc_reset(self, ctx):
         guild_id = str(ctx.guild.id)
-        today = get_today()
-        new_record = {
-            "campers": [],
-            "starter_camper": None,
-            "chosen_camper": None,
-            "confession_message": None,
-            "active": True,
-            "reactions": [],
-            "isPublic": None,
-            "thread_id": None,
-            "starter_camper_channel_id": ctx.channel.id,
-            "last_reset": today
-        }
-        self.save_campfire(guild_id, new_record)
+        replaced = None
+
+        def reset(campfire: Campfire) -> Campfire:
+            nonlocal replaced
+            if campfire.phase not in (None, CLOSED):
+                replaced = campfires.get(guild_id)
+                campfire.transition("closed", reason="reset")
+            # A reset campfire has no starter and is open for joining right away
+            return campfire.transition("lit", day=clock.today(guild_id), starter=None, channel=ctx.channel.id)
+        await update(self.key(guild_id), reset)
+        if replaced:
+            self.put_out(replaced)
         await ctx.send("♻️ Campfire has been reset for today. Ready for new confessions!")
 
 
@@ -1,5 +1,4 @@
 # rocket_date_game.py
-import json
 import discord
 from discord.ext import commands
 import random
@@ -9,35 +8,43 @@ from helpers import (
     ADMIN_IDS,
     DATE_LIMIT_PER_DAY,
     ADMIN_DATE_LIMIT_PER_DAY,
-    registered_users,
-    date_requests,
-    leaderboard,
-    history,
-    load_data,
-    save_all_data,
-    load_json_file,
-    save_json_file,
+    get_contestants,
+    expire_date_requests,
+    get_leaderboard,
+    get_history,
+    mark_dirty,
+    update,
+    read_json,
     is_admin,
-    get_today,
-    get_display_name_fast,
     ensure_registered,
     get_author_and_guild,
-    PaginatedEmbed,
     _send,
 )
+from resolver import get_resolver
+from components import register_pager, unregister_pager, first_page
+from outbound import outbound, COMMAND_MESSAGE_CAP
+from dms import dms
+from clock import clock
+
+PER_PAGE = 10
+
+
+def page_count(total: int) -> int:
+    return (total + PER_PAGE - 1) // PER_PAGE
 
 
 class RocketDate(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    async def cog_load(self):
         # Load fun text lines
-        self.HELP_DATA = load_json_file("json/help_text.json", {"title": "Help", "description": []})
-        self.roast_lines = load_json_file("json/roast_lines.json", [])
-        self.scream_lines = load_json_file("json/scream_lines.json", [])
-        self.drama_lines = load_json_file("json/drama_lines.json", [])
-        self.thunderbolt_lines = load_json_file("json/thunderbolt_lines.json", [])
-        self.thunderbolt_protected_lines = load_json_file("json/thunderbolt_protected_replies.json", [])
+        self.HELP_DATA = await read_json("json/help_text.json", {"title": "Help", "description": []})
+        self.roast_lines = await read_json("json/roast_lines.json", [])
+        self.scream_lines = await read_json("json/scream_lines.json", [])
+        self.drama_lines = await read_json("json/drama_lines.json", [])
+        self.thunderbolt_lines = await read_json("json/thunderbolt_lines.json", [])
+        self.thunderbolt_protected_lines = await read_json("json/thunderbolt_protected_replies.json", [])
 
         # Queues to prevent repeats
         self.roast_queue = self.roast_lines.copy()
@@ -54,6 +61,21 @@ class RocketDate(commands.Cog):
         self.thunderbolt_queue = self.thunderbolt_lines.copy()
         random.shuffle(self.thunderbolt_queue)
 
+        register_pager("contestants", self.count_contestant_pages, self.render_contestant_page)
+        register_pager("history", self.count_history_pages, self.render_history_page)
+        register_pager("leaderboard", self.count_leaderboard_pages, self.render_leaderboard_page)
+        # Anyone can DM feedback or ask for help; both run as normal commands
+        dms.register("feedback", ".tr feedback", "`.tr feedback <message>` — send feedback to Team Rocket HQ", open=True)
+        dms.register("help", ".tr help", "`.tr help` — the Team Rocket guide", open=True)
+        clock.on_rollover("date_requests", expire_date_requests)
+
+    async def cog_unload(self):
+        for name in ("contestants", "history", "leaderboard"):
+            unregister_pager(name)
+        dms.unregister("feedback")
+        dms.unregister("help")
+        clock.remove_rollover("date_requests")
+
     # ---------------- Core E-Date Handlers ----------------
     async def handle_rocket_date(self, source, sender, receiver):
         if not receiver:
@@ -64,8 +86,7 @@ class RocketDate(commands.Cog):
         receiver_id = str(receiver.id)
         guild_id = str(source.guild.id)
 
-        guild_users = registered_users.setdefault(guild_id, {})
-        guild_requests = date_requests.setdefault(guild_id, {})
+        guild_users = await get_contestants(guild_id)
 
         if sender_id == receiver_id and not is_admin(sender):
             await _send(source, "🙃 You can’t e-date yourself!")
@@ -79,24 +100,26 @@ class RocketDate(commands.Cog):
             await _send(source, "🚫 That user isn’t a registered contestant yet.")
             return
 
-        # Already requested today?
-        today = str(get_today())
-        existing_requests = [r for r, d in guild_requests.get(sender_id, []) if d == today and r == receiver_id]
-        if existing_requests:
-            await _send(source, "🛑 You already sent a date request to that user today.")
-            return
-
-        # Rate limit
-        daily_requests = [r for r, date_str in guild_requests.get(sender_id, []) if date_str == today]
+        today = clock.today(guild_id)
         limit = ADMIN_DATE_LIMIT_PER_DAY if is_admin(sender) else DATE_LIMIT_PER_DAY
-        if len(daily_requests) >= limit:
-            await _send(source, f"💥 You’ve already sent {limit} date request(s) today!")
+        refusal = None
+
+        def ask(sent):
+            nonlocal refusal
+            sent_today = [sent_to for sent_to, day in sent if day == today]
+            if receiver_id in sent_today:
+                refusal = "🛑 You already sent a date request to that user today."
+            elif len(sent_today) >= limit:
+                refusal = f"💥 You’ve already sent {limit} date request(s) today!"
+            else:
+                sent.append([receiver_id, today])
+            return sent
+        # Checked and stored as one update of the sender's requests, so parallel requests can't both pass the limit
+        await update(("date_requests", guild_id, sender_id), ask)
+        if refusal:
+            await _send(source, refusal)
             return
 
-        # Store request
-        guild_requests.setdefault(sender_id, []).append((receiver_id, today))
-        save_all_data()
-
         await _send(
             source,
             f"💘 {sender.mention} asked {receiver.mention} out! Reply with `.tr dateyes @user` or `.tr dateno @user <reason>`."
@@ -111,26 +134,17 @@ class RocketDate(commands.Cog):
         target_id = str(target.id)
         guild_id = str(source.guild.id)
 
-        guild_requests = date_requests.setdefault(guild_id, {})
-        guild_leaderboard = leaderboard.setdefault(guild_id, {})
-        guild_history = history.setdefault(guild_id, {})
-
-        valid_requests = guild_requests.get(target_id, [])
-        if not any(rid == sender_id for rid, _ in valid_requests):
+        # Remove accepted request; only the update that finds it goes on to score the match
+        accepted = await self.take_request(guild_id, target_id, sender_id)
+        if accepted:
+            # Update leaderboard & history
+            for user_id in (sender_id, target_id):
+                await update(("leaderboard", guild_id, user_id), lambda score: (score or 0) + 1)
+            await self.record_history(guild_id, sender_id, (int(target_id), True, None))
+            await self.record_history(guild_id, target_id, (int(sender_id), True, None))
+        if not accepted:
             await _send(source, f"❌ No e-date request found from {target.display_name}.")
             return
-
-        # Remove accepted request
-        guild_requests[target_id] = [(rid, ts) for rid, ts in valid_requests if rid != sender_id]
-
-        # Update leaderboard & history
-        guild_leaderboard[sender_id] = guild_leaderboard.get(sender_id, 0) + 1
-        guild_leaderboard[target_id] = guild_leaderboard.get(target_id, 0) + 1
-
-        guild_history.setdefault(sender_id, []).append((int(target_id), True, None))
-        guild_history.setdefault(target_id, []).append((int(sender_id), True, None))
-
-        save_all_data()
         await _send(source, f"💘 {sender.display_name} said YES to {target.display_name}! It's a match! 🧨", ephemeral=True)
 
     async def handle_date_reject(self, source, guild, receiver, sender, reason):
@@ -138,33 +152,42 @@ class RocketDate(commands.Cog):
         sender_id = str(sender.id)
         receiver_id = str(receiver.id)
 
-        guild_requests = date_requests.setdefault(guild_id, {})
-        guild_leaderboard = leaderboard.setdefault(guild_id, {})
-        guild_history = history.setdefault(guild_id, {})
-
-        valid_requests = guild_requests.get(sender_id, [])
-        if not any(tid == receiver_id for tid, _ in valid_requests):
+        # Remove rejected request
+        rejected = await self.take_request(guild_id, sender_id, receiver_id)
+        if rejected:
+            # Update leaderboard & history
+            await update(("leaderboard", guild_id, receiver_id), lambda score: (score or 0) + 1)
+            await self.record_history(guild_id, receiver_id, (int(sender_id), False, reason))
+            await self.record_history(guild_id, sender_id, (int(receiver_id), False, f"Rejected by {receiver.display_name}: {reason}"))
+        if not rejected:
             await _send(source, f"❌ No e-date request from {sender.display_name} to reject!")
             return
+        await _send(source, f"✅ Rejection recorded for {sender.display_name} 💔")
 
-        # Remove rejected request
-        guild_requests[sender_id] = [(tid, ts) for tid, ts in valid_requests if tid != receiver_id]
+    @staticmethod
+    async def take_request(guild_id: str, sender_id: str, receiver_id: str) -> bool:
+        """Drop the open request(s) from sender to receiver. False if there were none (or another answer won)."""
+        found = False
 
-        # Update leaderboard & history
-        guild_leaderboard[receiver_id] = guild_leaderboard.get(receiver_id, 0) + 1
-        guild_history.setdefault(receiver_id, []).append((int(sender_id), False, reason))
-        guild_history.setdefault(sender_id, []).append((int(receiver_id), False, f"Rejected by {receiver.display_name}: {reason}"))
+        def take(sent):
+            nonlocal found
+            found = any(sent_to == receiver_id for sent_to, _ in sent)
+            return [entry for entry in sent if entry[0] != receiver_id]
+        await update(("date_requests", guild_id, sender_id), take)
+        return found
 
-        save_all_data()
-        await _send(source, f"✅ Rejection recorded for {sender.display_name} 💔")
+    @staticmethod
+    async def record_history(guild_id: str, user_id: str, record):
+        # History is append-only: one in-memory append, no read-modify-write to guard
+        (await get_history(guild_id, user_id)).append(record)
+        mark_dirty("history", guild_id, user_id)
 
     async def handle_history_display(self, source, guild: discord.Guild, target: discord.Member):
         guild_id = str(guild.id)
         target_id = str(target.id)
         name = target.display_name
 
-        guild_history = history.setdefault(guild_id, {})
-        records = guild_history.get(target_id, [])
+        records = await get_history(guild_id, target_id)
 
         if not records:
             embed = discord.Embed(title="📜 E-Date History",
@@ -173,40 +196,78 @@ class RocketDate(commands.Cog):
             await _send(source, embed=embed)
             return
 
-        heart = "💖"
-        heartbreak = "💔"
-        lines = []
-        for uid, matched, reason in records:
-            try:
-                u = await self.bot.fetch_user(uid)
-                uname = u.display_name
-            except (discord.NotFound, discord.HTTPException):
-                uname = f"<Unknown User {uid}>"
+        embed, view = await first_page("history", guild, target_id)
+        await _send(source, embed=embed, view=view)
+
+    # ---------------- Pages ----------------
+    # Pagers are looked up by name when a page button is clicked, so they only
+    # get the guild, the string argument stored in the button and a page number.
+    async def count_contestant_pages(self, guild: discord.Guild, _arg: str) -> int:
+        return page_count(len(await get_contestants(str(guild.id))))
 
+    async def render_contestant_page(self, guild: discord.Guild, _arg: str, page: int) -> discord.Embed:
+        guild_users: Dict[str, Dict[str, str]] = await get_contestants(str(guild.id))
+        ids: List[str] = sorted(guild_users.keys(), key=int)
+        start = page * PER_PAGE
+        lines: List[str] = []
+        for idx, uid_str in enumerate(ids[start:start + PER_PAGE], start=start + 1):
+            member: Optional[discord.Member] = guild.get_member(int(uid_str))
+            display_name: str = member.display_name if member else guild_users[uid_str].get("name", f"<User {uid_str}>")
+            lines.append(f"`{idx}.` {display_name}")
+        return discord.Embed(title="🚀 Contestants", description="\n".join(lines), color=0xFF66CC)
+
+    async def count_history_pages(self, guild: discord.Guild, target_id: str) -> int:
+        return page_count(len(await get_history(str(guild.id), target_id)))
+
+    async def render_history_page(self, guild: discord.Guild, target_id: str, page: int) -> discord.Embed:
+        records = await get_history(str(guild.id), target_id)
+        start = page * PER_PAGE
+        chunk = records[start:start + PER_PAGE]
+        names = await get_resolver(self.bot).display_names(guild, [int(target_id), *(uid for uid, _, _ in chunk)])
+        name = names[int(target_id)] or f"<User {target_id}>"
+
+        lines = []
+        for uid, matched, reason in chunk:
+            uname = names[uid] or f"<Unknown User {uid}>"
             if matched:
-                lines.append(f"{heart} {uname}")
+                lines.append(f"💖 {uname}")
             else:
-                lines.append(f"{heartbreak} {uname} — *{reason or 'No reason given'}*")
+                lines.append(f"💔 {uname} — *{reason or 'No reason given'}*")
 
+        embed = discord.Embed(title=f"📜 E-Date History: {name}",
+                              description="\n".join(lines),
+                              color=0xFFAACC)
+        embed.set_footer(text=f"Total Records: {len(records)}")
+        return embed
 
-        # Paginate
-        per_page = 10
-        pages = []
-        for i in range(0, len(lines), per_page):
-            embed = discord.Embed(title=f"📜 E-Date History: {name}",
-                                  description="\n".join(lines[i:i+per_page]),
-                                  color=0xFFAACC)
-            embed.set_footer(text=f"Total Records: {len(lines)}")
-            pages.append(embed)
+    async def count_leaderboard_pages(self, guild: discord.Guild, _arg: str) -> int:
+        return page_count(len(await get_leaderboard(str(guild.id))))
 
-        paginator = PaginatedEmbed(pages)
-        await _send(source, embed=pages[0], view=paginator)
+    async def render_leaderboard_page(self, guild: discord.Guild, _arg: str, page: int) -> discord.Embed:
+        guild_id = str(guild.id)
+        board = await get_leaderboard(guild_id)
+        guild_users = await get_contestants(guild_id)
+        total = len(board)
+        entries = board.top(PER_PAGE, offset=page * PER_PAGE)
+        names = await self.rank_names(guild, guild_users, entries)
+        lines = [
+            self.format_rank_line(guild_users, names, idx, user_id, score)
+            for idx, user_id, score in entries
+        ]
+        embed = discord.Embed(
+            title=f"🏆 Rocket E-Date Leaderboard — {guild.name}",
+            description="\n".join(lines),
+            color=0x87CEEB
+        )
+        first = page * PER_PAGE
+        embed.set_footer(text=f"Showing {first+1}-{min(first+PER_PAGE, total)} of {total} contestants")
+        return embed
 
     async def handle_leaderboard_display(self, source, guild: discord.Guild):
         guild_id = str(guild.id)
-        guild_leaderboard = leaderboard.setdefault(guild_id, {})
+        board = await get_leaderboard(guild_id)
 
-        if not guild_leaderboard:
+        if not board:
             embed = discord.Embed(
                 title="📉 No leaderboard data yet!",
                 description="🚀 Team Rocket’s E-Date is still *blasting off…* eventually.",
@@ -215,29 +276,47 @@ class RocketDate(commands.Cog):
             await _send(source, embed=embed)
             return
 
-        sorted_users = sorted(guild_leaderboard.items(), key=lambda item: item[1], reverse=True)
-        guild_users = registered_users.setdefault(guild_id, {})
-        lines = []
+        embed, view = await first_page("leaderboard", guild)
+        await _send(source, embed=embed, view=view)
+
+    async def rank_names(self, guild: discord.Guild, guild_users, entries) -> Dict[int, Optional[str]]:
+        """Resolve the names of one page of board entries at once, skipping contestants with a registered name."""
+        unnamed = (user_id for _, user_id, _ in entries if not guild_users.get(user_id, {}).get("name"))
+        return await get_resolver(self.bot).display_names(guild, unnamed)
 
-        for idx, (user_id, score) in enumerate(sorted_users, start=1):
-            rank_tag = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else f"{idx}."
-            member = guild.get_member(int(user_id)) or await self.bot.fetch_user(int(user_id))
-            name = guild_users.get(user_id, {}).get("name") or get_display_name_fast(member, guild) if member else f"<User {user_id}>"
-            lines.append(f"{rank_tag} {name}: **{score}** points")
+    def format_rank_line(self, guild_users, names: Dict[int, Optional[str]], idx: int, user_id: str, score: int) -> str:
+        rank_tag = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else f"{idx}."
+        name = guild_users.get(user_id, {}).get("name") or names.get(int(user_id)) or f"<User {user_id}>"
+        return f"{rank_tag} {name}: **{score}** points"
+
+    async def handle_rank_display(self, source, guild: discord.Guild, target: discord.Member):
+        guild_id = str(guild.id)
+        board = await get_leaderboard(guild_id)
+        rank = board.rank(str(target.id))
 
-        per_page = 10
-        pages = []
-        for i in range(0, len(lines), per_page):
+        if rank is None:
             embed = discord.Embed(
-                title=f"🏆 Rocket E-Date Leaderboard — {guild.name}",
-                description="\n".join(lines[i:i+per_page]),
+                title="📉 Not ranked yet!",
+                description=f"{target.display_name} hasn’t scored any e-date points yet. 🚀",
                 color=0x87CEEB
             )
-            embed.set_footer(text=f"Showing {i+1}-{min(i+per_page,len(lines))} of {len(lines)} contestants")
-            pages.append(embed)
+            await _send(source, embed=embed)
+            return
+
+        guild_users = await get_contestants(guild_id)
+        nearby = board.around(rank, radius=2)
+        names = await self.rank_names(guild, guild_users, nearby)
+        lines = []
+        for idx, user_id, score in nearby:
+            line = self.format_rank_line(guild_users, names, idx, user_id, score)
+            lines.append(f"➡️ {line}" if idx == rank else line)
 
-        paginator = PaginatedEmbed(pages)
-        await _send(source, embed=pages[0], view=paginator)
+        embed = discord.Embed(
+            title=f"🏅 {target.display_name} is ranked #{rank} of {len(board)}",
+            description="\n".join(lines),
+            color=0x87CEEB
+        )
+        await _send(source, embed=embed)
 
     # ---------------- Commands ----------------
     @commands.group(name="tr", invoke_without_command=True)
@@ -249,21 +328,15 @@ class RocketDate(commands.Cog):
         guild_id: str = str(ctx.guild.id)
         user_id: str = str(ctx.author.id)
 
-        # Ensure we have a dictionary for this guild
-        guild_users: Dict[str, Dict[str, str]] = registered_users.setdefault(guild_id, {})
-
-        if user_id in guild_users:
-            await ctx.send("🚫 Already registered in this server.")
-            return
-
-        # Add the user safely
-        guild_users[user_id] = {
+        record = {
             "name": ctx.author.display_name,
             "gender": "?",
-            "registered_at": str(get_today())
+            "registered_at": clock.today(guild_id)
         }
-
-        save_all_data()
+        # Only stored if the user isn't registered yet
+        if await update(("contestants", guild_id, user_id), lambda info: info or record) is not record:
+            await ctx.send("🚫 Already registered in this server.")
+            return
         guild_name = "DMs" if ctx.guild is None else ctx.guild.name
         await ctx.send(f"✅ {ctx.author.mention} registered for Team Rocket E-Date in **{guild_name}**!")
 
@@ -271,34 +344,17 @@ class RocketDate(commands.Cog):
     @tr.command(name="list")
     async def tr_list(self, ctx: commands.Context):
         guild_id: str = str(ctx.guild.id)
-        guild_users: Dict[str, Dict[str, str]] = registered_users.get(guild_id, {})
-        ids: List[str] = sorted(guild_users.keys(), key=int)
+        guild_users: Dict[str, Dict[str, str]] = await get_contestants(guild_id)
         thinking_msg = await ctx.send("⏳ Calculating contestants...")
 
-        if not ids:
+        if not guild_users:
             embed = discord.Embed(title="🧨 No contestants yet!", color=0xFF66CC)
             await thinking_msg.edit(content=None, embed=embed)
             return
 
-        per_page: int = 10
-        pages: List[discord.Embed] = []
-
-        for i in range(0, len(ids), per_page):
-            chunk: List[str] = ids[i:i+per_page]
-            lines: List[str] = []
-
-            for idx, uid_str in enumerate(chunk):
-                uid: int = int(uid_str)
-                member: Optional[discord.Member] = ctx.guild.get_member(uid) if ctx.guild else None
-                display_name: str = member.display_name if member else guild_users[uid_str]["name"]
-                lines.append(f"`{i+idx+1}.` {display_name}")
-
-            embed = discord.Embed(title="🚀 Contestants", description="\n".join(lines), color=0xFF66CC)
-            pages.append(embed)
+        embed, view = await first_page("contestants", ctx.guild)
+        await thinking_msg.edit(content=None, embed=embed, view=view)
 
-        view = PaginatedEmbed(pages)
-        await thinking_msg.edit(content=None, embed=pages[0], view=view)
-    
 
     @tr.command(name="date")
     async def tr_date(self, ctx, member: Optional[discord.Member] = None):
@@ -319,6 +375,11 @@ class RocketDate(commands.Cog):
     async def tr_leaderboard(self, ctx):
         await self.handle_leaderboard_display(ctx, ctx.guild)
 
+    @tr.command(name="rank")
+    async def tr_rank(self, ctx, member: Optional[discord.Member] = None):
+        target = member or ctx.author
+        await self.handle_rank_display(ctx, ctx.guild, target)
+
     @tr.command(name="history")
     async def tr_history(self, ctx, member: Optional[discord.Member] = None):
         target = member or ctx.author
@@ -417,10 +478,10 @@ class RocketDate(commands.Cog):
         start_msg = f"🚀 Team Rocket Shouting Spring 💦 activated! 🎶\nYou shouted {message}!"
         end_msg = '💫 Team Rocket says: "We hope this Shouting Spring 💦 lifts your spirits and mends your day!"'
 
-        await ctx.send(start_msg)
-        for line in fountain_lines:
-            await ctx.send(line)
-        await ctx.send(end_msg)
+        # One queued run instead of a send per line; the scheduler packs it into a few messages.
+        # A long shout gets its fountain trimmed, never the closing line, which is sent on its own.
+        await outbound.send_many(ctx, [start_msg, *fountain_lines], owner=ctx.author.id, cap=max(1, COMMAND_MESSAGE_CAP - 1))
+        await outbound.send(ctx, end_msg, owner=ctx.author.id)
 
     # ---------------- FEEDBACK ----------------
     @tr.command(name="feedback")
@@ -451,9 +512,25 @@ class RocketDate(commands.Cog):
                 except Exception as e:
                     print(f"Could not send feedback to {admin_id}: {e}")
 
+    @tr.command(name="timezone")
+    async def tr_timezone(self, ctx, zone: Optional[str] = None):
+        guild_id = str(ctx.guild.id)
+        if zone is None:
+            await ctx.send(f"🕛 Days here follow **{clock.zone_of(guild_id)}** (today is {clock.today(guild_id)}).")
+            return
+        if not is_admin(ctx.author):
+            await ctx.send("❌ You don't have permission to use this.")
+            return
+        try:
+            await clock.set_zone(guild_id, zone)
+        except ValueError:
+            await ctx.send(f"❌ Unknown timezone `{zone}`. Use a name like `Asia/Manila` or `UTC`.")
+            return
+        await ctx.send(f"✅ Days here now follow **{zone}** (today is {clock.today(guild_id)}).")
+
     @tr.command(name="help", description="❓ Show Team Rocket Fun & Games Guide")
     async def rocket_help(self, ctx: commands.Context):
-        help_data = load_json_file("json/help_text.json", {"title": "Help", "description": []})
+        help_data = await read_json("json/help_text.json", {"title": "Help", "description": []})
         help_text = "\n".join(help_data.get("description", []))
 
         embed = discord.Embed(
@@ -2,14 +2,26 @@ import discord
 from discord.ext import commands
 import random
 import os
-import asyncio
-from helpers import load_json_file
+from helpers import read_json
+from animation import Frame, animations
+from assets import assets
+from asset_publisher import AssetPublisher, get_publisher
+from resolver import get_resolver
+from timers import timers
 
 # Admin IDs
 ADMIN_IDS = [688898170276675624, 409049845240692736, 416645930889117696]
 
 # Track ongoing dates per guild
 ongoing_dates = {}  # {guild_id: [user_id, ...]}
+date_views = {}  # {message_id: DateView} for dates still running
+
+
+def release_players(guild_id, user_ids):
+    if guild_id and guild_id in ongoing_dates:
+        for user_id in user_ids:
+            if user_id in ongoing_dates[guild_id]:
+                ongoing_dates[guild_id].remove(user_id)
 
 
 class DateView(discord.ui.View):
@@ -17,13 +29,17 @@ class DateView(discord.ui.View):
                  author: discord.Member,
                  date: discord.Member,
                  compliments: list,
+                 publisher: AssetPublisher,
                  timeout: int = 60):
-        super().__init__(timeout=timeout)
+        # Inactivity is tracked by a durable timer (see touch()) rather than the View timeout
+        super().__init__(timeout=None)
+        self.idle_timeout = timeout
         self.author = author
         self.date = date
         self.active = True
         self.current_turn = "first"  # "first" or "last"
         self.compliments = compliments
+        self.publisher = publisher
         self.turn_images = []
 
         # folders
@@ -40,30 +56,34 @@ class DateView(discord.ui.View):
         self.clear_items()
         self.add_item(self.FirstDoneButton(self))
 
-    async def on_timeout(self):
+    def touch(self):
+        """(Re)start the inactivity timer; every click on the date counts as activity."""
+        if not self.message or not self.active:
+            return
+        date_views[self.message.id] = self
+        timers.schedule(f"dd:{self.message.id}", self.idle_timeout, "dd_timeout",
+                        guild=self.message.guild.id, channel=self.message.channel.id,
+                        message=self.message.id, users=[self.author.id, self.date.id])
+
+    async def expire(self):
         if not self.active:
             return
         self.active = False
         self.clear_items()
+        self.stop()
         if self.message:
+            date_views.pop(self.message.id, None)
             await self.message.edit(
                 content="⌛ The date ended due to inactivity!", view=self)
 
-        guild_id = self.message.guild.id if self.message else None
-        if guild_id and guild_id in ongoing_dates:
-            for user_id in [self.author.id, self.date.id]:
-                if user_id in ongoing_dates[guild_id]:
-                    ongoing_dates[guild_id].remove(user_id)
-
-    async def show_whiteboard(self, member: discord.Member, target: discord.Member):
-        whiteboards = [
-            f for f in os.listdir(self.whiteboard_folder)
-            if f.lower().endswith((".gif", ".png"))
-        ]
+        release_players(self.message.guild.id if self.message else None, [self.author.id, self.date.id])
+
+    async def whiteboard_frame(self, member: discord.Member, target: discord.Member, delay: float = 0, **extra) -> Frame | None:
+        whiteboards = await assets.listdir(self.whiteboard_folder, lambda f: f.lower().endswith((".gif", ".png")))
         if not whiteboards:
             if self.message:
                 await self.message.channel.send("❌ No whiteboard assets found!")
-            return
+            return None
         chosen = random.choice(whiteboards)
         path = os.path.join(self.whiteboard_folder, chosen)
 
@@ -71,22 +91,18 @@ class DateView(discord.ui.View):
             title=f"🎨 {member.display_name} is drawing {target.display_name}...",
             description="Click the button when you finish your drawing!",
             color=discord.Color.purple())
-        embed.set_image(url=f"attachment://{chosen}")
-        file = discord.File(path, filename=chosen)
-        if self.message:
-            await self.message.edit(embed=embed, attachments=[file])
+        file = await self.publisher.image(embed, path, chosen)
+        # An empty list clears the previous screen's attachment when the image is a published URL
+        return Frame(delay, embed=embed, attachments=[file] if file else [], **extra)
 
-    async def show_result_image(self, member: discord.Member, turn: str):
+    async def result_frame(self, member: discord.Member, turn: str, delay: float = 0) -> Frame | None:
         folder = self.gender_folders["male"] if turn == "first" else self.gender_folders["female"]
-        images = [
-            f for f in os.listdir(folder)
-            if f.lower().endswith(("webp", ".jpg", ".png", ".gif", ".jpeg", ".avif"))
-        ]
+        images = await assets.listdir(folder, lambda f: f.lower().endswith(("webp", ".jpg", ".png", ".gif", ".jpeg", ".avif")))
         if not images:
             if self.message:
                 await self.message.channel.send(f"❌ No images found in {folder}")
             self.turn_images.append((member.display_name, None, folder))
-            return
+            return None
 
         chosen = random.choice(images)
         self.turn_images.append((member.display_name, chosen, folder))
@@ -95,12 +111,10 @@ class DateView(discord.ui.View):
         embed = discord.Embed(
             title=f"🎨 {member.display_name}'s drawing result!",
             color=discord.Color.green())
-        embed.set_image(url=f"attachment://{chosen}")
-        file = discord.File(path, filename=chosen)
-        if self.message:
-            await self.message.edit(embed=embed, attachments=[file])
+        file = await self.publisher.image(embed, path, chosen)
+        return Frame(delay, embed=embed, attachments=[file] if file else [])
 
-    async def show_final_result(self):
+    async def final_frame(self, delay: float = 0) -> Frame:
         embed = discord.Embed(
             title="💖 Team Rocket Drawing Date Result!",
             description="The results are in! Check out your amazing drawings below:",
@@ -114,17 +128,22 @@ class DateView(discord.ui.View):
             embed.add_field(name=f"{name}'s Drawing",
                             value=compliment,
                             inline=True)
-            files.append(discord.File(os.path.join(folder, fname), filename=fname))
+            files.append(await assets.file(os.path.join(folder, fname), filename=fname))
+        return Frame(delay, embed=embed, attachments=files)
 
-        if self.message:
-            await self.message.edit(embed=embed, attachments=files)
+    async def play(self, *frames: Frame | None) -> bool:
+        """Play the frames on the date message; frames that couldn't be built (None) are left out."""
+        frames = [frame for frame in frames if frame is not None]
+        if not self.message or not frames:
+            return False
+        return await animations.play(self.message, frames).wait()
 
+    def end_date(self):
         # Remove players from ongoing_dates
-        guild_id = self.message.guild.id if self.message else None
-        if guild_id and guild_id in ongoing_dates:
-            for user_id in [self.author.id, self.date.id]:
-                if user_id in ongoing_dates[guild_id]:
-                    ongoing_dates[guild_id].remove(user_id)
+        release_players(self.message.guild.id if self.message else None, [self.author.id, self.date.id])
+        if self.message:
+            date_views.pop(self.message.id, None)
+            timers.cancel(f"dd:{self.message.id}")
         self.active = False
         self.stop()
 
@@ -145,21 +164,17 @@ class DateView(discord.ui.View):
                     "❌ Only the first player can click this!", ephemeral=True)
                 return
 
+            view.touch()
             self.disabled = True
-            await interaction.response.defer()
-            if view.message:
-                await view.message.edit(view=view)
-
-            await view.show_result_image(view.author, "first")
-
             view.current_turn = "last"
-            await asyncio.sleep(1)
-            await view.show_whiteboard(view.date, view.author)
+            await interaction.response.edit_message(view=view)
 
+            # Result, then a second later the whiteboard with the next player's button
+            result = await view.result_frame(view.author, "first")
             view.clear_items()
             view.add_item(view.LastDoneButton(view))
-            if view.message:
-                await view.message.edit(view=view)
+            whiteboard = await view.whiteboard_frame(view.date, view.author, delay=1, view=view)
+            await view.play(result, whiteboard or Frame(1, view=view))
 
     class LastDoneButton(discord.ui.Button):
         def __init__(self, view):
@@ -177,22 +192,44 @@ class DateView(discord.ui.View):
                     "❌ Only the second player can click this!", ephemeral=True)
                 return
 
+            view.touch()
             self.disabled = True
-            await interaction.response.defer()
-            if view.message:
-                await view.message.edit(view=view)
+            await interaction.response.edit_message(view=view)
 
-            await view.show_result_image(view.date, "last")
-            await asyncio.sleep(3)
-            await view.show_final_result()
+            result = await view.result_frame(view.date, "last")
+            await view.play(result, await view.final_frame(delay=3))
+            view.end_date()
 
 
 class RocketDrawingDate(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.compliments = load_json_file("json/rocket_drawing_compliments.json", {})
+        self.compliments = {"compliments": []}
+
+    async def cog_load(self):
+        self.compliments = await read_json("json/rocket_drawing_compliments.json", {}, copy=True)
         if "compliments" not in self.compliments:
             self.compliments["compliments"] = []
+        timers.register("dd_timeout", self.date_timed_out)
+
+    async def cog_unload(self):
+        timers.unregister("dd_timeout")
+
+    async def date_timed_out(self, _key: str, payload: dict):
+        view = date_views.get(payload["message"])
+        if view is not None:
+            await view.expire()
+            return
+        # The date was running before a restart: its view is gone, so just close the message
+        release_players(payload["guild"], payload["users"])
+        channel = await get_resolver(self.bot).channel(payload["channel"])
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(payload["message"]).edit(
+                content="⌛ The date ended due to inactivity!", view=None)
+        except discord.HTTPException:
+            pass
 
     @commands.command(name="dd")
     async def dd(self, ctx, *, member_arg: str = None):
@@ -238,12 +275,13 @@ class RocketDrawingDate(commands.Cog):
             color=discord.Color.pink()
         )
 
-        view = DateView(author, member, self.compliments.get("compliments", []), timeout=60)
+        view = DateView(author, member, self.compliments.get("compliments", []), get_publisher(self.bot), timeout=60)
         message = await ctx.send(embed=embed, view=view)
         view.message = message
+        view.touch()
 
         # Show first turn whiteboard
-        await view.show_whiteboard(author, member)
+        await view.play(await view.whiteboard_frame(author, member))
 
 
 async def setup(bot):
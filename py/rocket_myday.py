@@ -1,34 +1,94 @@
 import discord
 from discord.ext import commands
-import json
-import os
+import copy
 import random
-from datetime import datetime
+from helpers import get_contestants, read_json, update, register_updatable, unregister_updatable
+from file_io import update_json
+from dms import dms
+from clock import clock
 
 MYDAY_FILE = "json/rocket_myday.json"
-CONTESTANTS_FILE = "json/rocket_contestants.json"
+MYDAY_ARCHIVE_FILE = "json/rocket_myday_archive.json"  # past days, same {guild: {day: session}} shape
 
 
-def load_json(file):
-    if not os.path.exists(file):
-        return {}
-    with open(file, "r") as f:
-        return json.load(f)
+def session_key(guild_id: str, day: str):
+    """update() key of a guild's MyDay session for one day."""
+    return "myday", guild_id, day
 
 
-def save_json(file, data):
-    with open(file, "w") as f:
-        json.dump(data, f, indent=4)
+async def current_session(guild_id: str, day: str):
+    session = (await read_json(MYDAY_FILE, {})).get(guild_id, {}).get(day)
+    return session, copy.deepcopy(session)
 
 
-def get_today():
-    return datetime.now().strftime("%Y-%m-%d")
+async def store_session(guild_id: str, day: str, session):
+    # One guild's day, written under the file's lock so other guilds' sessions are kept
+    def put(data):
+        sessions = data.setdefault(guild_id, {})
+        if session is None:
+            sessions.pop(day, None)
+        else:
+            sessions[day] = session
+        if not sessions:
+            del data[guild_id]
+        return data
+    await update_json(MYDAY_FILE, put, {})
 
 
 class MyDay(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        register_updatable("myday", current_session, store_session)
+        dms.register("myday", ".myday", "`.myday <message> public/private` — your MyDay entry", self.on_dm_entry)
+        clock.on_rollover("myday", self.archive_sessions)
+        # Today's chosen contestants can still send (or replace) their entry
+        data = await read_json(MYDAY_FILE, {})
+        for guild_id, sessions in data.items():
+            for user_id in sessions.get(clock.today(guild_id), {}).get("chosen", []):
+                dms.add(user_id, "myday", guild_id)
+
+    async def cog_unload(self):
+        unregister_updatable("myday")
+        dms.unregister("myday")
+        clock.remove_rollover("myday")
+
+    async def archive_sessions(self, guilds):
+        """Day rollover: move a batch of guilds' past sessions to the archive, one write per file."""
+        data = await read_json(MYDAY_FILE, {})
+        archived = {}
+        for guild_id, today in guilds.items():
+            past = {day: session for day, session in (data.get(guild_id) or {}).items() if day < today}
+            if past:
+                archived[guild_id] = past
+        if not archived:
+            return
+
+        def add_to_archive(archive):
+            for guild_id, past in archived.items():
+                archive.setdefault(guild_id, {}).update(past)
+            return archive
+
+        def drop_archived(data):
+            for guild_id, past in archived.items():
+                sessions = data.get(guild_id, {})
+                for day, session in past.items():
+                    # A late entry saved meanwhile keeps the day here; the next rollover archives it again
+                    if sessions.get(day) == session:
+                        del sessions[day]
+                if guild_id in data and not sessions:
+                    del data[guild_id]
+            return data
+        # Archive first: a crash in between leaves a session in both files, never in neither
+        await update_json(MYDAY_ARCHIVE_FILE, add_to_archive, {})
+        await update_json(MYDAY_FILE, drop_archived, {})
+
+        for guild_id, past in archived.items():
+            for session in past.values():
+                for user_id in session["chosen"]:
+                    dms.discard(user_id, "myday", guild_id)
+
     @commands.group(name="myday", invoke_without_command=True)
     async def myday(self, ctx, *, message: str = None):
         if message is None:
@@ -43,30 +103,32 @@ class MyDay(commands.Cog):
     @myday.command(name="start")
     async def myday_start(self, ctx):
         guild_id = str(ctx.guild.id)
-        data = load_json(MYDAY_FILE)
-        contestants = load_json(CONTESTANTS_FILE)
-
-        today = get_today()
-
-        if guild_id not in data:
-            data[guild_id] = {}
-
-        if today in data[guild_id]:
-            await ctx.send("⚠️ MyDay has already been started today. Use `.myday reset` if needed.")
-            return
+        today = clock.today(guild_id)
 
         # get contestant list for this guild
-        guild_contestants = contestants.get(guild_id, [])
-        if len(guild_contestants) < 3:
-            await ctx.send("❌ Not enough contestants to start MyDay (need at least 3).")
+        guild_contestants = list(await get_contestants(guild_id))
+        refusal = None
+        chosen = []
+
+        def start(session):
+            nonlocal refusal, chosen
+            if session is not None:
+                refusal = "⚠️ MyDay has already been started today. Use `.myday reset` if needed."
+                return session
+            if len(guild_contestants) < 3:
+                refusal = "❌ Not enough contestants to start MyDay (need at least 3)."
+                return session
+            chosen = random.sample(guild_contestants, 3)
+            return {
+                "chosen": chosen,
+                "entries": {}
+            }
+        await update(session_key(guild_id, today), start)
+        if refusal:
+            await ctx.send(refusal)
             return
-
-        chosen = random.sample(guild_contestants, 3)
-        data[guild_id][today] = {
-            "chosen": chosen,
-            "entries": {}
-        }
-        save_json(MYDAY_FILE, data)
+        for user_id in chosen:
+            dms.add(user_id, "myday", guild_id)
 
         await ctx.send(f"🌞 MyDay started! 3 contestants have been chosen for **{today}**.")
 
@@ -86,12 +148,17 @@ class MyDay(commands.Cog):
     @myday.command(name="reset")
     async def myday_reset(self, ctx):
         guild_id = str(ctx.guild.id)
-        data = load_json(MYDAY_FILE)
-        today = get_today()
-
-        if guild_id in data and today in data[guild_id]:
-            del data[guild_id][today]
-            save_json(MYDAY_FILE, data)
+        today = clock.today(guild_id)
+        found = None
+
+        def drop(session):
+            nonlocal found
+            found = session
+            return None
+        await update(session_key(guild_id, today), drop)
+        if found:
+            for user_id in found["chosen"]:
+                dms.discard(user_id, "myday", guild_id)
             await ctx.send("♻️ MyDay has been reset for today.")
         else:
             await ctx.send("⚠️ No MyDay session to reset today.")
@@ -99,8 +166,8 @@ class MyDay(commands.Cog):
     @myday.command(name="history")
     async def myday_history(self, ctx):
         guild_id = str(ctx.guild.id)
-        data = load_json(MYDAY_FILE)
-        today = get_today()
+        data = await read_json(MYDAY_FILE, {})
+        today = clock.today(guild_id)
 
         if guild_id not in data or today not in data[guild_id]:
             await ctx.send("📭 No MyDay has started today.")
@@ -130,50 +197,56 @@ class MyDay(commands.Cog):
         )
         await ctx.send(embed=embed)
 
-    # DM handler for chosen users
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not isinstance(message.channel, discord.DMChannel):
+    # DM handler for chosen users, routed by dms with the guilds they were chosen in
+    async def on_dm_entry(self, message, guild_ids):
+        user_id = str(message.author.id)
+        entry_text = message.content[len(".myday"):].strip()
+        if not entry_text:
+            await message.channel.send("Usage: `.myday <message> public/private`")
             return
 
-        if not message.content.startswith(".myday "):
+        # check privacy
+        privacy = "public"
+        if entry_text.lower().endswith(" private"):
+            privacy = "private"
+            entry_text = entry_text[:-7].strip()
+        elif entry_text.lower().endswith(" public"):
+            privacy = "public"
+            entry_text = entry_text[:-6].strip()
+
+        def save(session):
+            if not session or user_id not in session["chosen"]:
+                return session
+            session["entries"][user_id] = {
+                "message": entry_text,
+                "privacy": privacy
+            }
+            return session
+
+        saved_in = None
+        for guild_id in sorted(guild_ids):
+            today = clock.today(guild_id)
+            session = await update(session_key(guild_id, today), save)
+            if not session or user_id not in session["chosen"]:
+                # Session reset, or chosen on a day that has ended
+                dms.discard(user_id, "myday", guild_id)
+                continue
+            saved_in = guild_id
+            break
+
+        if saved_in is None:
+            await message.channel.send("📭 You aren't chosen for MyDay today.")
             return
 
-        user_id = str(message.author.id)
-        data = load_json(MYDAY_FILE)
-        today = get_today()
-
-        # find guild where this user was chosen today
-        for guild_id, sessions in data.items():
-            if today in sessions and user_id in sessions[today]["chosen"]:
-                entry_text = message.content[7:].strip()
-
-                # check privacy
-                privacy = "public"
-                if entry_text.lower().endswith(" private"):
-                    privacy = "private"
-                    entry_text = entry_text[:-7].strip()
-                elif entry_text.lower().endswith(" public"):
-                    privacy = "public"
-                    entry_text = entry_text[:-6].strip()
-
-                sessions[today]["entries"][user_id] = {
-                    "message": entry_text,
-                    "privacy": privacy
-                }
-                save_json(MYDAY_FILE, data)
-
-                # confirm to user
-                await message.channel.send(f"✅ Your MyDay entry for {today} has been saved as **{privacy}**.")
-
-                # announce in guild if public
-                if privacy == "public":
-                    guild = self.bot.get_guild(int(guild_id))
-                    if guild:
-                        channel = guild.system_channel or guild.text_channels[0]
-                        await channel.send(f"🌟 MyDay from **{message.author.display_name}**: {entry_text}")
+        # confirm to user
+        await message.channel.send(f"✅ Your MyDay entry for {today} has been saved as **{privacy}**.")
 
-                return
+        # announce in guild if public
+        if privacy == "public":
+            guild = self.bot.get_guild(int(saved_in))
+            if guild:
+                channel = guild.system_channel or guild.text_channels[0]
+                await channel.send(f"🌟 MyDay from **{message.author.display_name}**: {entry_text}")
 
 
 async def setup(bot):
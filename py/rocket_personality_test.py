@@ -2,18 +2,13 @@ import discord
 from discord.ext import commands
 import asyncio
 import random
-import json
-import os
+from helpers import read_json
+from components import RoutedButton, register_route, unregister_route, routed_view
+from resolver import get_resolver
+from timers import timers
 
-
-def load_json_file(file_path, default=None):
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return default or []
-
-
-PERSONALITY_TESTS = load_json_file("json/rocket_personality_test.json", [])
+PERSONALITY_TESTS_FILE = "json/rocket_personality_test.json"
+STEP_TIMEOUT = 60  # seconds to answer a step
 
 
 class PersonalityTest(commands.Cog):
@@ -23,6 +18,16 @@ class PersonalityTest(commands.Cog):
         self.active_tests = {}  # thread.id -> test state
         self.user_test_history = {}  # user.id -> set of completed test titles
         self.thread_owners = {}  # thread.id -> user.id of participant
+        self.tests = []
+
+    async def cog_load(self):
+        self.tests = await read_json(PERSONALITY_TESTS_FILE, []) or []
+        register_route("pt", self.handle_choice)
+        timers.register("pt_step", self.step_timed_out)
+
+    async def cog_unload(self):
+        unregister_route("pt")
+        timers.unregister("pt_step")
 
     @commands.group(name="pt", invoke_without_command=True)
     async def pt(self, ctx):
@@ -30,20 +35,20 @@ class PersonalityTest(commands.Cog):
 
     @pt.command(name="start")
     async def pt_start(self, ctx):
-        if not PERSONALITY_TESTS:
+        if not self.tests:
             await ctx.send("⚠️ No personality tests found!")
             return
 
         user_id = ctx.author.id
         completed = self.user_test_history.get(user_id, set())
         available_tests = [
-            t for t in PERSONALITY_TESTS if t["title"] not in completed
+            t for t in self.tests if t["title"] not in completed
         ]
 
         if not available_tests:
             # All tests completed, reset history
             completed = set()
-            available_tests = PERSONALITY_TESTS.copy()
+            available_tests = self.tests.copy()
             await ctx.send(
                 "🎉 You’ve completed all personality tests! Starting over..."
             )
@@ -85,8 +90,7 @@ class PersonalityTest(commands.Cog):
             "thread": thread,
             "parent_channel_id": ctx.channel.id,
             "active": True,
-            "current_message": None,
-            "timeout_task": None
+            "current_message": None
         }
         self.active_tests[thread.id] = state
 
@@ -118,55 +122,64 @@ class PersonalityTest(commands.Cog):
         embed = discord.Embed(title=f"Step {step_index+1}",
                               description=step["text"],
                               color=discord.Color.blurple())
-        view = discord.ui.View(timeout=60)  # 1 minute inactivity timeout
-
+        # Buttons carry (owner, step, choice); clicks come back through handle_choice
         user_id = self.thread_owners.get(thread_id)
+        view = routed_view(*(
+            RoutedButton("pt", user_id, step_index, choice_index,
+                         label=choice["label"], style=discord.ButtonStyle.primary)
+            for choice_index, choice in enumerate(step.get("choices", []))
+        ))
 
-        # Add buttons for each choice
-        for choice in step.get("choices", []):
-
-            async def button_callback(interaction, choice=choice):
-                # Only the test participant can click
-                if interaction.user.id != user_id:
-                    await interaction.response.send_message(
-                        "❌ You cannot choose for someone else!", ephemeral=True
-                    )
-                    return
-
-                # Update points
-                for k, v in choice["points"].items():
-                    state["points"][k] = state["points"].get(k, 0) + v
+        state["current_message"] = await thread.send(embed=embed, view=view)
+        timers.schedule(f"pt:{thread_id}", STEP_TIMEOUT, "pt_step", thread=thread_id, step=step_index)
 
-                # Cancel timeout task
-                if state["timeout_task"]:
-                    state["timeout_task"].cancel()
-                    state["timeout_task"] = None
+    async def step_timed_out(self, _key: str, payload: dict):
+        thread_id = payload["thread"]
+        state = self.active_tests.get(thread_id)
+        if state is None:
+            # Tests don't survive a restart; still tell the thread its test is over
+            thread = await get_resolver(self.bot).channel(thread_id)
+            if thread:
+                await thread.send("⏱️ Test ended due to inactivity!")
+            return
+        if state["active"] and state["step_index"] == payload["step"]:
+            await state["thread"].send("⏱️ Test ended due to inactivity!")
+            await self.show_result(thread_id, finished=False)
+
+    async def handle_choice(self, interaction: discord.Interaction, owner_id: str, step_index: str, choice_index: str):
+        # Only the test participant can click
+        if interaction.user.id != int(owner_id):
+            await interaction.response.send_message(
+                "❌ You cannot choose for someone else!", ephemeral=True
+            )
+            return
 
-                # Disable buttons after click
-                if state["current_message"]:
-                    await state["current_message"].edit(view=None)
+        thread_id = interaction.channel_id
+        state = self.active_tests.get(thread_id)
+        if not state or not state["active"] or state["step_index"] != int(step_index):
+            await interaction.response.edit_message(view=None)
+            await interaction.followup.send("⌛ This question has already ended.", ephemeral=True)
+            return
 
-                # Publicly announce choice
-                await thread.send(f"✅ {interaction.user.mention} chose: {choice['label']}")
+        choice = state["test"]["steps"][state["step_index"]]["choices"][int(choice_index)]
+        # Advance before awaiting anything so a double click can't count twice
+        state["step_index"] += 1
 
-                # Move to next step
-                state["step_index"] += 1
-                await self.run_step(thread_id)
+        # Update points
+        for k, v in choice["points"].items():
+            state["points"][k] = state["points"].get(k, 0) + v
 
-            btn = discord.ui.Button(label=choice["label"],
-                                    style=discord.ButtonStyle.primary)
-            btn.callback = button_callback
-            view.add_item(btn)
+        # Cancel the step timeout
+        timers.cancel(f"pt:{thread_id}")
 
-        state["current_message"] = await thread.send(embed=embed, view=view)
+        # Disable buttons after click
+        await interaction.response.edit_message(view=None)
 
-        async def timeout_task():
-            await asyncio.sleep(60)
-            if state["active"]:
-                await thread.send("⏱️ Test ended due to inactivity!")
-                await self.show_result(thread_id, finished=False)
+        # Publicly announce choice
+        await state["thread"].send(f"✅ {interaction.user.mention} chose: {choice['label']}")
 
-        state["timeout_task"] = asyncio.create_task(timeout_task())
+        # Move to next step
+        await self.run_step(thread_id)
 
     async def show_result(self, thread_id, finished=True):
         state = self.active_tests.get(thread_id)
@@ -176,6 +189,7 @@ class PersonalityTest(commands.Cog):
         test = state["test"]
         thread = state["thread"]
         state["active"] = False
+        timers.cancel(f"pt:{thread_id}")
 
         if state["points"]:
             personality = max(state["points"],
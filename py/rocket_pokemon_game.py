@@ -3,21 +3,47 @@ import discord
 from discord.ext import commands
 import asyncio
 import random
-from helpers import load_json_file, save_json_file
+from helpers import read_json, get_pokemon, update
+from storage import GLOBAL_SCOPE
+from pokemon_models import Pokemon, SpeciesIndex
+from animation import Frame, animations
+from assets import assets
+from asset_publisher import get_publisher
+from dms import dms
 
 
 class RocketPokemon(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.POKEMON_LIST = load_json_file("json/rocket_pokemon_list.json", [])
-        self.OWNERS_FILE = "json/rocket_pokemon_owners.json"
+        self.species = SpeciesIndex([])
 
-    def load_owners(self):
-        return load_json_file(self.OWNERS_FILE, {})
+    async def cog_load(self):
+        self.species = SpeciesIndex(await read_json("json/rocket_pokemon_list.json", []))
+        # Pokémon belong to the user, not a guild, so the whole group works in DMs
+        dms.register("poke", ".poke", "`.poke catch` (and the rest of `.poke`) — your Pokémon", open=True)
 
-    def save_owners(self, data):
-        save_json_file(self.OWNERS_FILE, data)
+    async def cog_unload(self):
+        dms.unregister("poke")
+
+    async def owned(self, ctx):
+        """The author's pokemon and its species entry, or (None, None) after telling them why."""
+        p = await get_pokemon(str(ctx.author.id))
+        if p is None:
+            await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
+            return None, None
+        pokemon = self.species.get(p.species_id)
+        if not pokemon:
+            await ctx.send("⚠️ Pokémon data missing.")
+            return None, None
+        return p, pokemon
+
+    async def bump(self, ctx, field: str) -> Pokemon:
+        """Add one to a walks/feeds/wins/losses counter of the author's pokemon."""
+        def apply(p: Pokemon) -> Pokemon:
+            setattr(p, field, getattr(p, field) + 1)
+            return p
+        return await update(("pokemon", GLOBAL_SCOPE, str(ctx.author.id)), apply)
 
     @commands.group(name="poke", invoke_without_command=True)
     async def poke(self, ctx):
@@ -26,14 +52,13 @@ class RocketPokemon(commands.Cog):
     # ---------------- Commands ----------------
     @poke.command(name="catch")
     async def tr_catch(self, ctx):
-        owners = self.load_owners()
         user_id = str(ctx.author.id)
 
-        if user_id in owners:
+        if await get_pokemon(user_id) is not None:
             await ctx.send(f"{ctx.author.mention}, you already have a Pokémon! ❌")
             return
 
-        if not self.POKEMON_LIST:
+        if not self.species:
             await ctx.send("⚠️ No Pokémon are available to catch. Try again later.")
             return
 
@@ -45,20 +70,14 @@ class RocketPokemon(commands.Cog):
         await ctx.send(random.choice(searching_msgs))
         await asyncio.sleep(2)
 
-        chosen = random.choice(self.POKEMON_LIST)
-        owners[user_id] = {
-            "rocket_pokemon": chosen["id"],
-            "name": "UNKNOWN",
-            "level": 1,
-            "walks": 0,
-            "feeds": 0,
-            "battle": {"win": 0, "loss": 0},
-            "asset": chosen["asset"]["main"],
-            "evolution_asset": chosen["asset"]["evolution"]
-        }
-        self.save_owners(owners)
-
-        file = discord.File(chosen["asset"]["main"], filename="pokemon.gif")
+        chosen = random.choice(self.species.species)
+        caught = Pokemon.caught(chosen)
+        # Another .poke catch may have finished during the search; keep the first one
+        if await update(("pokemon", GLOBAL_SCOPE, user_id), lambda p: p or caught) is not caught:
+            await ctx.send(f"{ctx.author.mention}, you already have a Pokémon! ❌")
+            return
+
+        file = await assets.file(chosen["asset"]["main"], filename="pokemon.gif")
         await ctx.send(
             f"🎉 {ctx.author.mention}, you found **{chosen['name']}**!\nType `.poke name <nickname>` to give your Pokémon a name.",
             file=file
@@ -66,180 +85,116 @@ class RocketPokemon(commands.Cog):
 
     @poke.command(name="name")
     async def tr_name(self, ctx, *, nickname: str = None):
-        owners = self.load_owners()
-        user_id = str(ctx.author.id)
-
-        if user_id not in owners:
+        if await get_pokemon(str(ctx.author.id)) is None:
             await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
             return
         if not nickname:
             await ctx.send("❌ You need to provide a nickname!")
             return
 
-        owners[user_id]["name"] = nickname
-        self.save_owners(owners)
+        def rename(p: Pokemon) -> Pokemon:
+            p.name = nickname
+            return p
+        await update(("pokemon", GLOBAL_SCOPE, str(ctx.author.id)), rename)
         await ctx.send(f"✅ Your Pokémon is now named **{nickname}**!")
 
     @poke.command(name="show")
     async def tr_show(self, ctx):
-        owners = self.load_owners()
-        user_id = str(ctx.author.id)
-
-        if user_id not in owners:
-            await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
-            return
-
-        p = owners[user_id]
-        pokemon = next(
-            (pkm for pkm in self.POKEMON_LIST if pkm["id"] == p["rocket_pokemon"]),
-            None
-        )
-        if not pokemon:
-            await ctx.send("⚠️ Pokémon data missing.")
+        p, pokemon = await self.owned(ctx)
+        if p is None:
             return
 
-        name_display = p["name"] if p["name"] != "UNKNOWN" else "UNKNOWN ❓ (your Pokémon wants a name!)"
-
-        # Compute average completion for level
-        walk_pct = min(p.get("walks", 0), 5) / 5
-        feed_pct = min(p.get("feeds", 0), 5) / 5
-        battle_pct = min(p.get("battle", {}).get("win", 0), 5) / 5
-        avg_pct = (walk_pct + feed_pct + battle_pct) / 3
-        level = max(1, min(5, round(avg_pct * 5)))
-        p["level"] = level
-        self.save_owners(owners)
+        name_display = p.name if p.named else "UNKNOWN ❓ (your Pokémon wants a name!)"
+        level = p.level
 
         # Use evolution asset if level 5
-        asset_file = p["evolution_asset"] if level == 5 else p["asset"]
+        asset_file = p.evolution_asset if level == 5 else p.asset
         file_name = "evo.gif" if level == 5 else "pokemon.gif"
-        file = discord.File(asset_file, filename=file_name)
+        file = await assets.file(asset_file, filename=file_name)
 
         await ctx.send(
             f"**{name_display}**\n"
             f"📈 Level: {level}\n"
-            f"🚶 Walks: {p.get('walks',0)}/5\n"
-            f"🍓 Feeds: {p.get('feeds',0)}/5\n"
-            f"⚔️ Wins: {p.get('battle', {}).get('win',0)}/5 | ❌ Loss: {p.get('battle', {}).get('loss',0)}",
+            f"🚶 Walks: {p.walks}/5\n"
+            f"🍓 Feeds: {p.feeds}/5\n"
+            f"⚔️ Wins: {p.wins}/5 | ❌ Loss: {p.losses}",
             file=file
         )
 
     @poke.command(name="walk")
     async def tr_walk(self, ctx):
-        owners = self.load_owners()
-        user_id = str(ctx.author.id)
-
-        if user_id not in owners:
-            await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
-            return
-
-        p = owners[user_id]
-        pokemon = next(
-            (pkm for pkm in self.POKEMON_LIST if pkm["id"] == p["rocket_pokemon"]),
-            None
-        )
-        if not pokemon:
-            await ctx.send("⚠️ Pokémon data missing.")
+        p, pokemon = await self.owned(ctx)
+        if p is None:
             return
 
-        p["walks"] = p.get("walks", 0) + 1
-        self.save_owners(owners)
+        p = await self.bump(ctx, "walks")
 
-        display_name = p["name"] if p["name"] != "UNKNOWN" else pokemon["name"]
+        display_name = p.name if p.named else pokemon["name"]
 
         embed = discord.Embed(title=f"🚶 Walking with {display_name}", description="", color=discord.Color.green())
-        file = discord.File(pokemon["asset"]["walking"], filename="walk.gif")
-        embed.set_image(url="attachment://walk.gif")
+        file = await get_publisher(self.bot).image(embed, pokemon["asset"]["walking"], "walk.gif")
 
         msg = await ctx.send(file=file, embed=embed)
 
         # Slowly add footsteps
+        frames = []
         for _ in range(3):
-            await asyncio.sleep(1.5)
             embed.description += "👣\n"
-            await msg.edit(embed=embed)
-
-        await asyncio.sleep(1.5)
-        embed.description += f"\nWalks: **{p['walks']}/5**"
-        await msg.edit(embed=embed)
+            frames.append(Frame(1.5, embed=embed.copy()))
+        embed.description += f"\nWalks: **{p.walks}/5**"
+        frames.append(Frame(1.5, embed=embed.copy()))
+        animations.play(msg, frames)
 
     @poke.command(name="battle")
     async def tr_battle(self, ctx):
-        owners = self.load_owners()
-        user_id = str(ctx.author.id)
-
-        if user_id not in owners:
-            await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
-            return
-
-        p = owners[user_id]
-        pokemon = next(
-            (pkm for pkm in self.POKEMON_LIST if pkm["id"] == p["rocket_pokemon"]),
-            None
-        )
-        if not pokemon:
-            await ctx.send("⚠️ Pokémon data missing.")
+        p, pokemon = await self.owned(ctx)
+        if p is None:
             return
 
         result = random.choice(["win", "loss"])
-        p["battle"][result] = p["battle"].get(result, 0) + 1
-        self.save_owners(owners)
+        p = await self.bump(ctx, "wins" if result == "win" else "losses")
 
-        display_name = p["name"] if p["name"] != "UNKNOWN" else pokemon["name"]
+        display_name = p.name if p.named else pokemon["name"]
 
         embed = discord.Embed(title=f"⚔️ {display_name} enters battle!", description="battling.....\n💥", color=discord.Color.red())
-        file = discord.File(pokemon["asset"]["battling"], filename="battle.gif")
-        embed.set_image(url="attachment://battle.gif")
+        file = await get_publisher(self.bot).image(embed, pokemon["asset"]["battling"], "battle.gif")
 
         message = await ctx.send(file=file, embed=embed)
-        await asyncio.sleep(2)
+        frames = []
         embed.description = "battling.....\n💥\n💥 boom!"
-        await message.edit(embed=embed)
+        frames.append(Frame(2, embed=embed.copy()))
 
-        await asyncio.sleep(2)
         outcome_text = "🏆 Congrats! You won!" if result == "win" else "💀 Oh no! You lost!"
-        embed.description = f"battling.....\n💥\n💥 boom!\n💥 boggsh!!\n{outcome_text}\n\nWins: **{p['battle']['win']}/5** | Losses: **{p['battle']['loss']}**"
-        await message.edit(embed=embed)
+        embed.description = f"battling.....\n💥\n💥 boom!\n💥 boggsh!!\n{outcome_text}\n\nWins: **{p.wins}/5** | Losses: **{p.losses}**"
+        frames.append(Frame(2, embed=embed.copy()))
+        animations.play(message, frames)
 
     @poke.command(name="feed")
     async def tr_feed(self, ctx):
-        owners = self.load_owners()
-        user_id = str(ctx.author.id)
-
-        if user_id not in owners:
-            await ctx.send("❌ You don’t have a Pokémon yet! Use `.poke catch` first.")
-            return
-
-        p = owners[user_id]
-        pokemon = next(
-            (pkm for pkm in self.POKEMON_LIST if pkm["id"] == p["rocket_pokemon"]),
-            None
-        )
-        if not pokemon:
-            await ctx.send("⚠️ Pokémon data missing.")
+        p, pokemon = await self.owned(ctx)
+        if p is None:
             return
 
-        p["feeds"] = p.get("feeds", 0) + 1
-        self.save_owners(owners)
+        p = await self.bump(ctx, "feeds")
 
-        display_name = p["name"] if p["name"] != "UNKNOWN" else pokemon["name"]
+        display_name = p.name if p.named else pokemon["name"]
 
         embed = discord.Embed(
             title="🍴 Feeding Time!",
             description=f"You are feeding your Pokémon pet **{display_name}** 💙",
             color=discord.Color.blue()
         )
-        file = discord.File(pokemon["asset"]["feeding"], filename="feed.gif")
-        embed.set_image(url="attachment://feed.gif")
+        file = await get_publisher(self.bot).image(embed, pokemon["asset"]["feeding"], "feed.gif")
 
         msg = await ctx.send(file=file, embed=embed)
+        frames = []
         for _ in range(3):
-            await asyncio.sleep(1.5)
             embed.description += f"\nnom..."
-            await msg.edit(embed=embed)
+            frames.append(Frame(1.5, embed=embed.copy()))
 
-        await asyncio.sleep(1.5)
-        embed.description += f"\n{display_name} is now full 💤\nFeed: **{p['feeds']}/5**"
-        await msg.edit(embed=embed)
+        embed.description += f"\n{display_name} is now full 💤\nFeed: **{p.feeds}/5**"
+        frames.append(Frame(1.5, embed=embed.copy()))
+        animations.play(msg, frames)
 
 
 # ---------------- Setup Cog ----------------
@@ -1,9 +1,9 @@
-import os
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Button
-from helpers import load_json_file, is_admin
+from helpers import read_json, is_admin
+from resolver import get_resolver
 
 # Map JSON style strings to Discord ButtonStyle
 STYLE_MAP = {
@@ -38,16 +38,12 @@ class CommandButton(Button):
         target_channel = None
         thread_jump_url = None
 
-        try:
-            if self.thread_id:
-                target_channel = await bot.fetch_channel(int(self.thread_id))
-                thread_jump_url = target_channel.jump_url
-            elif self.channel_id:
-                target_channel = await bot.fetch_channel(int(self.channel_id))
-            else:
-                target_channel = interaction.channel
-        except Exception:
-            target_channel = interaction.channel
+        if self.thread_id:
+            target_channel = await get_resolver(bot).channel(int(self.thread_id))
+            thread_jump_url = target_channel.jump_url if target_channel else None
+        elif self.channel_id:
+            target_channel = await get_resolver(bot).channel(int(self.channel_id))
+        target_channel = target_channel or interaction.channel
 
         # Create temporary message to build context for invocation
         fake_msg = await target_channel.send(f"🚀 Executing `{self.command}` for {interaction.user.display_name}...")
@@ -96,16 +92,13 @@ class RocketListView(View):
 class RocketSlash(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        help_file = os.path.join(base_dir, "json", "help_text.json")
-        self.HELP_DATA = load_json_file(help_file, {"title": "Help", "description": []})
 
     @app_commands.command(name="rocket-list", description="Show Rocket Bot menu (Admins only).")
     async def rocket_list(self, interaction: discord.Interaction):
         if not is_admin(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to use this.", ephemeral=True)
 
-        data = load_json_file("json/rocket_bot.json", default={})
+        data = await read_json("json/rocket_bot.json", default={})
         sections = data.get("sections", [])
         if not sections:
             sections = [{"title": "🚀 Rocket Bot", "description": "Welcome to Rocket Bot!", "buttons": []}]
@@ -144,7 +137,7 @@ class RocketSlash(commands.Cog):
 
     @app_commands.command(name="rocket-help", description="❓ Show Team Rocket Fun & Games Guide")
     async def rocket_help(self, interaction: discord.Interaction):
-        help_data = load_json_file("json/help_text.json", {"title": "Help", "description": []})
+        help_data = await read_json("json/help_text.json", {"title": "Help", "description": []})
         help_text = "\n".join(help_data.get("description", []))
         embed = discord.Embed(
             title=help_data.get("title", "Help"),
@@ -1,44 +1,135 @@
 # py/rocket_thread_restriction.py
-import json
+#
+# Per-thread command allow-lists. The JSON rules are compiled into a frozen
+# channel id -> prefix set map, checked by a global bot check before any
+# command runs (typed, or invoked by a button), so the check is a dict lookup
+# with no disk access. Text that doesn't name a command is never checked. The map
+# is rebuilt when the file changes (polled in the background) or on demand
+# with `.restrictions reload`.
+
 import os
+import asyncio
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Optional, Tuple
+
+from discord.ext import commands
+
+from helpers import read_json, write_json, run_io, is_admin, logger
 
 JSON_PATH = "json/rocket_thread_restriction.json"
+RESTRICTION_POLL_SECONDS = float(os.getenv("ROCKET_RESTRICTION_POLL", "5"))
 
-def load_restrictions():
+_NO_RULES: FrozenSet[str] = frozenset()
+_rules: Mapping[int, FrozenSet[str]] = MappingProxyType({})
+_signature: Optional[Tuple[int, int]] = None
+
+
+async def load_restrictions():
     """Load thread restriction data from JSON."""
-    if not os.path.exists(JSON_PATH):
-        return {}
-    with open(JSON_PATH, "r") as f:
-        return json.load(f)
+    return await read_json(JSON_PATH, {}, revalidate=True)
+
+
+async def save_restrictions(data):
+    """Save thread restriction data to JSON and apply it right away."""
+    await write_json(JSON_PATH, data)
+    await reload_restrictions()
+
+
+def compile_restrictions(data) -> Mapping[int, FrozenSet[str]]:
+    """{"<channel id>": ["tr", ...]} -> read-only {channel_id: frozenset({"tr", ...})}. Empty lists mean unrestricted."""
+    compiled = {}
+    for channel_id, prefixes in (data or {}).items():
+        allowed = frozenset(p.strip().lower() for p in prefixes if p.strip())
+        if allowed:
+            compiled[int(channel_id)] = allowed
+    return MappingProxyType(compiled)
+
+
+def _file_signature() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(JSON_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-def save_restrictions(data):
-    """Save thread restriction data to JSON."""
-    with open(JSON_PATH, "w") as f:
-        json.dump(data, f, indent=2)
 
-def global_thread_check(message):
+async def reload_restrictions() -> int:
+    """Recompile the rules from disk. Returns the number of restricted channels."""
+    global _rules, _signature
+    _signature = await run_io(_file_signature)
+    try:
+        _rules = compile_restrictions(await load_restrictions())
+    except (ValueError, TypeError, AttributeError) as e:
+        # Keep the previous rules rather than opening every thread up
+        logger.error(f"Invalid {JSON_PATH}, keeping previous restrictions: {e}")
+    return len(_rules)
+
+
+async def watch_restrictions(interval: float = RESTRICTION_POLL_SECONDS):
+    """Reload whenever the rules file's mtime or size changes."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await run_io(_file_signature) != _signature:
+                count = await reload_restrictions()
+                logger.info(f"Thread restrictions reloaded ({count} channels)")
+        except Exception as e:
+            logger.error(f"Thread restriction watcher error: {e}")
+
+
+class ThreadRestricted(commands.CheckFailure):
+    def __init__(self, allowed_prefixes: FrozenSet[str]):
+        self.allowed_prefixes = allowed_prefixes
+        super().__init__(f"🚫 Only {', '.join(f'`.{p}`' for p in sorted(allowed_prefixes))} commands work in this thread.")
+
+
+def global_thread_check(ctx: commands.Context) -> bool:
     """
-    Block any command not in the allowed prefixes for this thread.
-    Returns a tuple: (allowed: bool, allowed_prefixes: list[str])
+    Global bot check: block any command whose top-level name (e.g. "tr" for
+    ".tr date @user") isn't allowed in this thread. Raises ThreadRestricted.
     """
-    if not message.content.startswith("."):
-        return True, []  # Not a command, allow
+    allowed_prefixes = _rules.get(ctx.channel.id, _NO_RULES)
+    if not allowed_prefixes or ctx.command is None:
+        return True
+    root = ctx.command.root_parent or ctx.command
+    if allowed_prefixes.isdisjoint((root.name, *root.aliases)):
+        raise ThreadRestricted(allowed_prefixes)
+    return True
+
+
+class ThreadRestriction(commands.Cog):
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.watcher: Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        self.bot.add_check(global_thread_check)
+        count = await reload_restrictions()
+        logger.info(f"Thread restrictions loaded ({count} channels)")
+        self.watcher = asyncio.create_task(watch_restrictions())
 
-    channel_id = str(message.channel.id)
-    data = load_restrictions()
-    allowed_prefixes = data.get(channel_id, [])
+    async def cog_unload(self):
+        self.bot.remove_check(global_thread_check)
+        if self.watcher:
+            self.watcher.cancel()
 
-    # No restrictions for this thread
-    if not allowed_prefixes:
-        return True, []
+    @commands.group(name="restrictions", invoke_without_command=True)
+    async def restrictions(self, ctx: commands.Context):
+        prefixes = _rules.get(ctx.channel.id)
+        if prefixes:
+            await ctx.send(f"🔒 Allowed here: {', '.join(f'`.{p}`' for p in sorted(prefixes))}")
+        else:
+            await ctx.send("🔓 No command restrictions in this channel.")
 
-    # Extract first word after the dot
-    invoked = message.content.split()[0][1:].lower()
+    @restrictions.command(name="reload")
+    async def restrictions_reload(self, ctx: commands.Context):
+        if not is_admin(ctx.author):
+            await ctx.send("❌ You don't have permission to use this.")
+            return
+        count = await reload_restrictions()
+        await ctx.send(f"✅ Thread restrictions reloaded ({count} restricted channels).")
 
-    # Allow exact match or subcommand of allowed prefixes
-    for prefix in allowed_prefixes:
-        prefix_lower = prefix.lower()
-        if invoked == prefix_lower or invoked.startswith(f"{prefix_lower} "):
-            return True, allowed_prefixes
 
-    return False, allowed_prefixes
+async def setup(bot: commands.Bot):
+    await bot.add_cog(ThreadRestriction(bot))
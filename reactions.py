@@ -0,0 +1,88 @@
+# reactions.py
+#
+# Reaction routing by message id. Features that care about reactions on a
+# particular message register a handler for that message; the single
+# on_raw_reaction_add listener does one dictionary lookup per reaction and
+# ignores everything else, instead of every pending bot.wait_for predicate
+# being evaluated against every reaction the bot can see. Raw events are used
+# so routing also works for messages that aren't in the message cache (for
+# example after a restart, once the owner has re-registered its handlers).
+
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+import discord
+
+logger = logging.getLogger("TeamRocketBot")
+
+ReactionHandler = Callable[[discord.RawReactionActionEvent], Awaitable[None]]
+
+
+class ReactionTally:
+    """One reaction per user: a set for the duplicate check, a Counter per emoji, and the first reactions in order."""
+
+    __slots__ = ("users", "counts", "entries")
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()):
+        self.users: Set[str] = set()
+        self.counts: Counter = Counter()
+        self.entries: List[Tuple[str, str]] = []
+        for user_id, emoji in entries:
+            self.add(user_id, emoji)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    def add(self, user_id: str, emoji: str) -> bool:
+        """Count the user's reaction; False if they had already reacted."""
+        if user_id in self.users:
+            return False
+        self.users.add(user_id)
+        self.counts[emoji] += 1
+        self.entries.append((user_id, emoji))
+        return True
+
+    def to_payload(self) -> List[List[str]]:
+        return [[user_id, emoji] for user_id, emoji in self.entries]
+
+
+class ReactionRouter:
+
+    def __init__(self):
+        self._handlers: Dict[int, ReactionHandler] = {}
+        self.stats = {"routed": 0, "ignored": 0, "failed": 0}
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def register(self, message_id: int, handler: ReactionHandler):
+        self._handlers[int(message_id)] = handler
+
+    def unregister(self, message_id: int):
+        self._handlers.pop(int(message_id), None)
+
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        handler = self._handlers.get(payload.message_id)
+        if handler is None:
+            self.stats["ignored"] += 1
+            return
+        self.stats["routed"] += 1
+        try:
+            await handler(payload)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.exception(f"Reaction handler for message {payload.message_id} failed: {e}")
+
+    def report(self) -> Dict[str, int]:
+        return {"messages": len(self._handlers), **self.stats}
+
+
+reactions = ReactionRouter()
+
+
+def setup_reactions(bot: discord.Client):
+    bot.add_listener(reactions.on_raw_reaction_add, "on_raw_reaction_add")
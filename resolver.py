@@ -0,0 +1,118 @@
+# resolver.py
+#
+# One place to turn user/member/channel ids into Discord objects.
+# Lookups try discord.py's gateway cache first, then a TTL LRU of earlier
+# REST results (including "not found" answers), and only then hit the API,
+# with a cap on how many fetches run at once and one fetch per id in flight.
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+import discord
+
+from helpers import logger
+from ttl_cache import TTLCache, MISSING
+
+RESOLVER_TTL = 600  # seconds a fetched object is reused
+RESOLVER_NEGATIVE_TTL = 120  # seconds a NotFound/Forbidden answer is remembered
+RESOLVER_MAX_ENTRIES = 5000
+RESOLVER_CONCURRENCY = 8
+
+
+class EntityResolver:
+
+    def __init__(self, bot: discord.Client, concurrency: int = RESOLVER_CONCURRENCY):
+        self.bot = bot
+        self._cache = TTLCache(RESOLVER_MAX_ENTRIES)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"local": 0, "cached": 0, "fetched": 0, "missing": 0}
+
+    async def _resolve(self, key: Hashable, local: Optional[Any], fetch: Callable[[], Awaitable[Any]]):
+        if local is not None:
+            self.stats["local"] += 1
+            return local
+        cached = self._cache.get(key)
+        if cached is not MISSING:
+            self.stats["cached"] += 1
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self._semaphore:
+                try:
+                    value = await fetch()
+                    self.stats["fetched"] += 1
+                    self._cache.put(key, value, RESOLVER_TTL)
+                except (discord.NotFound, discord.Forbidden):
+                    value = None
+                    self.stats["missing"] += 1
+                    self._cache.put(key, None, RESOLVER_NEGATIVE_TTL)
+                except discord.HTTPException as e:
+                    # Transient failure: don't cache, let the next caller retry
+                    logger.warning(f"Resolver fetch failed for {key}: {e}")
+                    value = None
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so it doesn't warn when nobody was waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+    # ---------- single lookups ----------
+    async def user(self, user_id: int) -> Optional[discord.User]:
+        user_id = int(user_id)
+        return await self._resolve(("user", user_id), self.bot.get_user(user_id), lambda: self.bot.fetch_user(user_id))
+
+    async def member(self, guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+        user_id = int(user_id)
+        return await self._resolve(
+            ("member", guild.id, user_id), guild.get_member(user_id), lambda: guild.fetch_member(user_id)
+        )
+
+    async def channel(self, channel_id: int):
+        """Channel or thread by id. Threads may come back archived; callers check that."""
+        channel_id = int(channel_id)
+        return await self._resolve(
+            ("channel", channel_id), self.bot.get_channel(channel_id), lambda: self.bot.fetch_channel(channel_id)
+        )
+
+    # ---------- batches ----------
+    async def users(self, user_ids: Iterable[int]) -> Dict[int, Optional[discord.User]]:
+        """Resolve a page of ids at once; fetches run concurrently up to the resolver's limit."""
+        ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+        results = await asyncio.gather(*(self.user(uid) for uid in ids))
+        return dict(zip(ids, results))
+
+    async def display_names(self, guild: Optional[discord.Guild], user_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        """Member display name when the user is in the guild, else their global name. None if unknown."""
+        ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+        names: Dict[int, Optional[str]] = {}
+        remote = []
+        for uid in ids:
+            member = guild.get_member(uid) if guild else None
+            if member:
+                names[uid] = member.display_name
+            else:
+                remote.append(uid)
+        for uid, user in (await self.users(remote)).items():
+            names[uid] = user.display_name if user else None
+        return names
+
+
+def get_resolver(bot: discord.Client) -> EntityResolver:
+    resolver = getattr(bot, "_rocket_resolver", None)
+    if resolver is None:
+        resolver = EntityResolver(bot)
+        bot._rocket_resolver = resolver
+    return resolver
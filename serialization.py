@@ -0,0 +1,33 @@
+# serialization.py
+#
+# One place that turns data into JSON bytes and back. Uses orjson when it is
+# installed and falls back to compact stdlib json otherwise. Output is compact
+# unless ROCKET_PRETTY_JSON=1 is set, which is meant for debugging only.
+
+import os
+import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+PRETTY_JSON = os.getenv("ROCKET_PRETTY_JSON") == "1"
+BACKEND = "orjson" if orjson else "json"
+
+
+def dumps(obj, pretty: bool = PRETTY_JSON) -> bytes:
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | str):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,461 @@
+# storage.py
+#
+# Pluggable persistence backends for the bot's datasets.
+# Every dataset is shaped guild_id -> user_id -> value, so backends only have
+# to load a guild (or one user inside it) and apply batches of changes.
+# Datasets that aren't per guild (pokemon) live under GLOBAL_SCOPE.
+
+import os
+import sqlite3
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from serialization import dumps, loads
+
+logger = logging.getLogger("TeamRocketBot")
+
+# (dataset, guild_id, user_id, value) — value None deletes the entry
+Change = Tuple[str, str, str, Any]
+
+DATASET_NAMES = ("contestants", "date_requests", "leaderboard", "history", "pokemon")
+GLOBAL_SCOPE = "0"  # guild id used for datasets shared by every guild
+# Legacy files that map user_id -> value directly, with no guild level
+UNSCOPED_LEGACY = {"pokemon"}
+# Stored one file per user by the JSON backend, so a write never touches other users
+# and nothing but the in-memory models has to stay resident
+PER_USER_DATASETS = {"pokemon", "history"}
+
+
+def atomic_write(filename: str, data: bytes):
+    """Write data to filename via a temp file + rename so readers never see a torn file."""
+    directory = os.path.dirname(filename) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json(filename: str, default):
+    if not os.path.exists(filename):
+        return default
+    with open(filename, "rb") as f:
+        return loads(f.read())
+
+
+class StorageBackend:
+    """Interface shared by all backends. Calls are blocking; run them off the event loop."""
+
+    name = "base"
+
+    def load(self, dataset: str, guild_id: str, user_id: Optional[str] = None):
+        """Return {user_id: value} for a guild, or a single user's value (None if absent)."""
+        raise NotImplementedError
+
+    def write(self, changes: Iterable[Change]):
+        """Apply a batch of changes atomically where the backend allows it."""
+        raise NotImplementedError
+
+    def evict(self, guild_id: str):
+        """Drop any cached state for a guild. Only called once the guild has been flushed."""
+
+    def close(self):
+        pass
+
+
+class JsonBackend(StorageBackend):
+    """
+    One JSON shard per guild and dataset: <root>/<guild_id>/<dataset>.json.
+    A guild's activity only rewrites that guild's shards, and shards stay
+    cached until the guild is evicted. Datasets in PER_USER_DATASETS use a
+    file per user instead: <root>/<guild_id>/<dataset>/<user_id>.json, and
+    are never cached here.
+    """
+
+    name = "json"
+
+    def __init__(self, root: str, legacy_files: Optional[Dict[str, str]] = None):
+        self.root = root
+        self._shards: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if legacy_files:
+            self._split_legacy(legacy_files)
+        self._split_shards()
+
+    def _path(self, dataset: str, guild_id: str) -> str:
+        if not guild_id.isdigit():
+            raise ValueError(f"Invalid guild id for shard path: {guild_id!r}")
+        return os.path.join(self.root, guild_id, f"{dataset}.json")
+
+    def _user_path(self, dataset: str, guild_id: str, user_id: str) -> str:
+        if not user_id.isdigit():
+            raise ValueError(f"Invalid user id for record path: {user_id!r}")
+        return os.path.join(self.root, guild_id, dataset, f"{user_id}.json")
+
+    def _load_users(self, dataset: str, guild_id: str, user_id: Optional[str]):
+        if user_id is not None:
+            return _read_json(self._user_path(dataset, guild_id, user_id), None)
+        folder = os.path.dirname(self._user_path(dataset, guild_id, "0"))
+        if not os.path.isdir(folder):
+            return {}
+        return {
+            name[:-5]: _read_json(os.path.join(folder, name), None)
+            for name in os.listdir(folder) if name.endswith(".json") and name[:-5].isdigit()
+        }
+
+    def _shard(self, dataset: str, guild_id: str) -> Dict[str, Any]:
+        key = (dataset, guild_id)
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = _read_json(self._path(dataset, guild_id), {})
+            self._shards[key] = shard
+        return shard
+
+    def load(self, dataset, guild_id, user_id=None):
+        if dataset in PER_USER_DATASETS:
+            return self._load_users(dataset, guild_id, user_id)
+        with self._lock:
+            shard = self._shard(dataset, guild_id)
+            if user_id is None:
+                return dict(shard)
+            return shard.get(user_id)
+
+    def write(self, changes):
+        with self._lock:
+            touched = set()
+            for dataset, guild_id, user_id, value in changes:
+                if dataset in PER_USER_DATASETS:
+                    path = self._user_path(dataset, guild_id, user_id)
+                    if value is not None:
+                        atomic_write(path, dumps(value))
+                    elif os.path.exists(path):
+                        os.remove(path)
+                    continue
+                shard = self._shard(dataset, guild_id)
+                if value is None:
+                    shard.pop(user_id, None)
+                else:
+                    shard[user_id] = value
+                touched.add((dataset, guild_id))
+            for dataset, guild_id in touched:
+                atomic_write(self._path(dataset, guild_id), dumps(self._shards[(dataset, guild_id)]))
+
+    def evict(self, guild_id):
+        with self._lock:
+            for dataset in DATASET_NAMES:
+                self._shards.pop((dataset, guild_id), None)
+
+    def _split_legacy(self, files: Dict[str, str]):
+        """Split the old all-guild files into shards the first time the shard root is used."""
+        scoped = [dataset for dataset in DATASET_NAMES if dataset not in UNSCOPED_LEGACY]
+        self._migrate(files, scoped, ".migrated")
+        for dataset in UNSCOPED_LEGACY:
+            self._migrate(files, [dataset], f".migrated-{dataset}")
+
+    def _split_shards(self):
+        """Move datasets that earlier versions kept in guild shards into their per-user files."""
+        marker = os.path.join(self.root, ".split-per-user")
+        if os.path.exists(marker):
+            return
+        count = 0
+        guild_ids = os.listdir(self.root) if os.path.isdir(self.root) else []
+        for guild_id in filter(str.isdigit, guild_ids):
+            for dataset in PER_USER_DATASETS:
+                path = self._path(dataset, guild_id)
+                if not os.path.exists(path):
+                    continue
+                users = _read_json(path, {})
+                self.write([(dataset, guild_id, uid, value) for uid, value in users.items() if uid.isdigit()])
+                os.remove(path)
+                count += 1
+        atomic_write(marker, b"1")
+        if count:
+            logger.info(f"Split {count} guild shard(s) into per-user files under {self.root}.")
+
+    def _migrate(self, files: Dict[str, str], datasets: List[str], marker_name: str):
+        marker = os.path.join(self.root, marker_name)
+        if os.path.exists(marker):
+            return
+        count = 0
+        for dataset in datasets:
+            data = _legacy_data(dataset, files[dataset])
+            for guild_id, users in data.items():
+                if not isinstance(users, dict) or not guild_id.isdigit():
+                    continue
+                if dataset == "contestants":
+                    users = {uid: info for uid, info in users.items() if isinstance(info, dict)}
+                if dataset in PER_USER_DATASETS:
+                    self.write([(dataset, guild_id, uid, value) for uid, value in users.items() if uid.isdigit()])
+                else:
+                    atomic_write(self._path(dataset, guild_id), dumps(users))
+                count += 1
+        atomic_write(marker, b"1")
+        logger.info(f"Split legacy JSON files into {count} guild shard(s) under {self.root}.")
+
+
+def _legacy_data(dataset: str, filename: str) -> Dict[str, Any]:
+    """Legacy file contents shaped guild_id -> user_id -> value."""
+    data = _read_json(filename, {})
+    if dataset in UNSCOPED_LEGACY:
+        return {GLOBAL_SCOPE: data} if data else {}
+    return data
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS contestants (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    gender TEXT NOT NULL DEFAULT '?',
+    registered_at TEXT,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS date_requests (
+    guild_id TEXT NOT NULL,
+    sender_id TEXT NOT NULL,
+    receiver_id TEXT NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_date_requests_sender_day ON date_requests (guild_id, sender_id, day);
+CREATE INDEX IF NOT EXISTS idx_date_requests_receiver ON date_requests (guild_id, receiver_id);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard (guild_id, score DESC);
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    partner_id INTEGER NOT NULL,
+    matched INTEGER NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_user ON history (guild_id, user_id, seq);
+CREATE TABLE IF NOT EXISTS pokemon (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite in WAL mode with one table per dataset, indexed by guild and user."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    # ---------- reads ----------
+    def load(self, dataset, guild_id, user_id=None):
+        with self._lock:
+            return getattr(self, f"_load_{dataset}")(guild_id, user_id)
+
+    def _load_contestants(self, guild_id, user_id):
+        sql = "SELECT user_id, name, gender, registered_at FROM contestants WHERE guild_id = ?"
+        args: Tuple = (guild_id,)
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            args += (user_id,)
+        rows = {
+            uid: {"name": name, "gender": gender, "registered_at": registered_at}
+            for uid, name, gender, registered_at in self._conn.execute(sql, args)
+        }
+        return rows if user_id is None else rows.get(user_id)
+
+    def _load_leaderboard(self, guild_id, user_id):
+        if user_id is not None:
+            row = self._conn.execute(
+                "SELECT score FROM leaderboard WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+            ).fetchone()
+            return row[0] if row else None
+        return dict(self._conn.execute(
+            "SELECT user_id, score FROM leaderboard WHERE guild_id = ? ORDER BY score DESC", (guild_id,)
+        ))
+
+    def _load_date_requests(self, guild_id, user_id):
+        if user_id is not None:
+            rows = self._conn.execute(
+                "SELECT receiver_id, day FROM date_requests WHERE guild_id = ? AND sender_id = ? ORDER BY rowid",
+                (guild_id, user_id),
+            ).fetchall()
+            return [[receiver_id, day] for receiver_id, day in rows] or None
+        grouped: Dict[str, List[List[str]]] = {}
+        for sender_id, receiver_id, day in self._conn.execute(
+            "SELECT sender_id, receiver_id, day FROM date_requests WHERE guild_id = ? ORDER BY rowid", (guild_id,)
+        ):
+            grouped.setdefault(sender_id, []).append([receiver_id, day])
+        return grouped
+
+    def _load_history(self, guild_id, user_id):
+        if user_id is not None:
+            rows = self._conn.execute(
+                "SELECT partner_id, matched, reason FROM history WHERE guild_id = ? AND user_id = ? ORDER BY seq",
+                (guild_id, user_id),
+            ).fetchall()
+            return [_history_entry(*row) for row in rows] or None
+        grouped: Dict[str, List[list]] = {}
+        for uid, partner_id, matched, reason in self._conn.execute(
+            "SELECT user_id, partner_id, matched, reason FROM history WHERE guild_id = ? ORDER BY seq", (guild_id,)
+        ):
+            grouped.setdefault(uid, []).append(_history_entry(partner_id, matched, reason))
+        return grouped
+
+    def _load_pokemon(self, guild_id, user_id):
+        if user_id is not None:
+            row = self._conn.execute(
+                "SELECT record FROM pokemon WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+            ).fetchone()
+            return loads(row[0]) if row else None
+        return {
+            uid: loads(record)
+            for uid, record in self._conn.execute("SELECT user_id, record FROM pokemon WHERE guild_id = ?", (guild_id,))
+        }
+
+    # ---------- writes ----------
+    def write(self, changes):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for dataset, guild_id, user_id, value in changes:
+                    getattr(self, f"_write_{dataset}")(guild_id, user_id, value)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _write_contestants(self, guild_id, user_id, info):
+        if info is None:
+            self._conn.execute("DELETE FROM contestants WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO contestants (guild_id, user_id, name, gender, registered_at) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, info.get("name", ""), info.get("gender", "?"), info.get("registered_at")),
+        )
+
+    def _write_leaderboard(self, guild_id, user_id, score):
+        if score is None:
+            self._conn.execute("DELETE FROM leaderboard WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO leaderboard (guild_id, user_id, score) VALUES (?, ?, ?)",
+            (guild_id, user_id, int(score)),
+        )
+
+    def _write_date_requests(self, guild_id, sender_id, requests):
+        self._conn.execute("DELETE FROM date_requests WHERE guild_id = ? AND sender_id = ?", (guild_id, sender_id))
+        if requests:
+            self._conn.executemany(
+                "INSERT INTO date_requests (guild_id, sender_id, receiver_id, day) VALUES (?, ?, ?, ?)",
+                [(guild_id, sender_id, receiver_id, day) for receiver_id, day in requests],
+            )
+
+    def _write_history(self, guild_id, user_id, records):
+        # History is append-only, so only insert what the table doesn't have yet
+        if records is None:
+            self._conn.execute("DELETE FROM history WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            return
+        stored = self._conn.execute(
+            "SELECT COUNT(*) FROM history WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()[0]
+        if stored > len(records):
+            self._conn.execute("DELETE FROM history WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            stored = 0
+        self._conn.executemany(
+            "INSERT INTO history (guild_id, user_id, partner_id, matched, reason) VALUES (?, ?, ?, ?, ?)",
+            [
+                (guild_id, user_id, int(entry[0]), int(bool(entry[1])), entry[2] if len(entry) > 2 else None)
+                for entry in records[stored:]
+            ],
+        )
+
+    def _write_pokemon(self, guild_id, user_id, record):
+        if record is None:
+            self._conn.execute("DELETE FROM pokemon WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pokemon (guild_id, user_id, record) VALUES (?, ?, ?)",
+            (guild_id, user_id, dumps(record).decode()),
+        )
+
+    # ---------- migration ----------
+    def import_json(self, files: Dict[str, str]) -> bool:
+        """Import the legacy json/*.json files once. Returns True if anything was imported."""
+        scoped = [dataset for dataset in DATASET_NAMES if dataset not in UNSCOPED_LEGACY]
+        imported = self._import(files, scoped, "json_imported")
+        for dataset in UNSCOPED_LEGACY:
+            imported |= self._import(files, [dataset], f"json_imported_{dataset}")
+        return imported
+
+    def _import(self, files: Dict[str, str], datasets: List[str], meta_key: str) -> bool:
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (meta_key,)).fetchone():
+                return False
+        changes: List[Change] = []
+        for dataset in datasets:
+            data = _legacy_data(dataset, files[dataset])
+            for guild_id, users in data.items():
+                if not isinstance(users, dict):
+                    continue
+                for user_id, value in users.items():
+                    if dataset == "contestants" and not isinstance(value, dict):
+                        continue
+                    changes.append((dataset, guild_id, user_id, value))
+        self.write(changes)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", (meta_key,))
+        logger.info(f"Imported {len(changes)} record(s) from JSON into {self.path}.")
+        return bool(changes)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _history_entry(partner_id, matched, reason):
+    return [partner_id, bool(matched), reason] if reason else [partner_id, bool(matched)]
+
+
+def open_backend(kind: str, files: Dict[str, str], sqlite_path: str, data_dir: str) -> StorageBackend:
+    if kind == "sqlite":
+        backend = SQLiteBackend(sqlite_path)
+        backend.import_json(files)
+        return backend
+    if kind == "json":
+        return JsonBackend(data_dir, legacy_files=files)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+if __name__ == "__main__":
+    # python storage.py [sqlite_path] — import the JSON files into SQLite and exit
+    import sys
+    from helpers import DATASET_FILES, SQLITE_FILE
+
+    target = sys.argv[1] if len(sys.argv) > 1 else SQLITE_FILE
+    SQLiteBackend(target).import_json(DATASET_FILES)
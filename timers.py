@@ -0,0 +1,255 @@
+# timers.py
+#
+# One durable timer service for every timeout in the bot (campfire confession
+# windows, personality-test steps, drawing dates). Timers live in a
+# hierarchical timing wheel driven by a single task: LEVELS wheels of SLOTS
+# slots each, the first ticking every TICK seconds and each next one SLOTS
+# times slower. A timer sits in the coarsest wheel that still resolves it and
+# is cascaded down as its deadline approaches, so scheduling, cancelling and
+# rescheduling are dictionary operations however many timers are pending.
+#
+# Timers are identified by a string key (scheduling an existing key moves it)
+# and fire the handler registered for their kind with the JSON payload they
+# were scheduled with. Deadlines are wall-clock and saved to TIMERS_FILE a
+# moment after each change; a timer is only removed from the file once its
+# handler has returned, so one interrupted by a restart fires again. Timers
+# overdue at load fire right away; timers whose kind has no handler yet wait
+# until one is registered.
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from file_io import read_json, write_json
+
+logger = logging.getLogger("TeamRocketBot")
+
+TIMERS_FILE = "json/rocket_timers.json"
+TICK = 1.0  # seconds per slot of the finest wheel
+SLOTS = 64
+LEVELS = 4  # 64 s, ~68 min, ~3 days, ~194 days; later deadlines wait in the overflow
+TIMER_FLUSH_DELAY = float(os.getenv("ROCKET_TIMER_FLUSH_SECONDS", "1"))
+
+Handler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class Timer:
+    __slots__ = ("key", "kind", "due", "payload", "tick", "bucket")
+
+    def __init__(self, key: str, kind: str, due: float, payload: Dict[str, Any]):
+        self.key = key
+        self.kind = kind
+        self.due = due
+        self.payload = payload
+        self.tick = int(due // TICK)
+        self.bucket: Optional[dict] = None  # the slot holding the timer
+
+    def to_payload(self) -> list:
+        return [self.kind, self.due, self.payload]
+
+
+class TimerWheel:
+
+    def __init__(self, path: str = TIMERS_FILE):
+        self.path = path
+        self._wheels: List[List[Dict[str, Timer]]] = [[{} for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._overflow: Dict[str, Timer] = {}
+        self._expired: Dict[str, Timer] = {}  # overdue at scheduling time, fired on the next tick
+        self._timers: Dict[str, Timer] = {}
+        self._firing: Dict[str, Timer] = {}  # handler running; still saved so a restart retries it
+        self._waiting: Dict[str, Dict[str, Timer]] = {}  # kind without a handler -> timers
+        self._handlers: Dict[str, Handler] = {}
+        self._current = int(time.time() // TICK)  # next tick to process
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self.stats = {"scheduled": 0, "cancelled": 0, "fired": 0, "cascaded": 0, "failed": 0}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    # ---------- handlers ----------
+    def register(self, kind: str, handler: Handler):
+        self._handlers[kind] = handler
+        waiting = self._waiting.pop(kind, None)
+        if waiting:
+            for timer in waiting.values():
+                self._fire(timer)
+
+    def unregister(self, kind: str):
+        self._handlers.pop(kind, None)
+
+    # ---------- scheduling ----------
+    def schedule(self, key: str, delay: float, kind: str, **payload) -> Timer:
+        """(Re)schedule `key` to fire `kind` after `delay` seconds."""
+        return self.schedule_at(key, time.time() + delay, kind, **payload)
+
+    def schedule_at(self, key: str, due: float, kind: str, **payload) -> Timer:
+        self._unlink(key)
+        if not self._timers:
+            # The ticker skips idle time; place relative to now, not the last tick it processed
+            self._current = max(self._current, int(time.time() // TICK))
+        timer = self._timers[key] = Timer(key, kind, due, payload)
+        self._place(timer)
+        self.stats["scheduled"] += 1
+        self._changed()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return timer
+
+    def cancel(self, key: str) -> bool:
+        if self._unlink(key) is None:
+            return False
+        self.stats["cancelled"] += 1
+        self._changed()
+        return True
+
+    def due(self, key: str) -> Optional[float]:
+        timer = self._timers.get(key)
+        return timer.due if timer else None
+
+    def _unlink(self, key: str) -> Optional[Timer]:
+        waiting = next((timers.pop(key) for timers in self._waiting.values() if key in timers), None)
+        timer = self._timers.pop(key, None)
+        if timer is not None and timer.bucket is not None:
+            timer.bucket.pop(key, None)
+            timer.bucket = None
+        return timer or waiting
+
+    def _place(self, timer: Timer):
+        delta = timer.tick - self._current
+        if delta < 0:
+            bucket = self._expired
+        else:
+            bucket = self._overflow
+            span = SLOTS
+            for level in range(LEVELS):
+                if delta < span:
+                    bucket = self._wheels[level][(timer.tick // (span // SLOTS)) % SLOTS]
+                    break
+                span *= SLOTS
+        bucket[timer.key] = timer
+        timer.bucket = bucket
+
+    # ---------- ticking ----------
+    def _cascade(self, tick: int):
+        """At wheel boundaries, move the next coarse slot's timers down to finer wheels."""
+        for level in range(LEVELS, 0, -1):
+            span = SLOTS ** level
+            if tick % span:
+                continue
+            if level == LEVELS:
+                timers, self._overflow = self._overflow, {}
+            else:
+                slot = self._wheels[level][(tick // span) % SLOTS]
+                timers = dict(slot)
+                slot.clear()
+            for timer in timers.values():
+                self._place(timer)
+            self.stats["cascaded"] += len(timers)
+
+    def _process(self, tick: Optional[int]):
+        """Fire the timers due at `tick` (None: only the ones that were already overdue)."""
+        expired = dict(self._expired)
+        self._expired.clear()
+        if tick is not None:
+            self._cascade(tick)
+            expired.update(self._wheels[0][tick % SLOTS])
+            self._wheels[0][tick % SLOTS].clear()
+        for timer in expired.values():
+            timer.bucket = None
+            del self._timers[timer.key]
+            self._fire(timer)
+
+    def _fire(self, timer: Timer):
+        handler = self._handlers.get(timer.kind)
+        if handler is None:
+            self._waiting.setdefault(timer.kind, {})[timer.key] = timer
+            return
+        self._firing[timer.key] = timer
+        asyncio.create_task(self._run(handler, timer))
+
+    async def _run(self, handler: Handler, timer: Timer):
+        try:
+            await handler(timer.key, timer.payload)
+            self.stats["fired"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.exception(f"Timer {timer.key} ({timer.kind}) failed: {e}")
+        finally:
+            if self._firing.get(timer.key) is timer:
+                del self._firing[timer.key]
+            self._changed()
+
+    async def _tick(self):
+        while True:
+            if not self._timers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            now = int(time.time() // TICK)
+            while self._current <= now:
+                self._process(self._current)
+                self._current += 1
+            if self._expired:
+                self._process(None)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._current * TICK - time.time())
+            except asyncio.TimeoutError:
+                pass
+
+    # ---------- lifecycle & persistence ----------
+    async def load(self):
+        """Restore saved timers. Overdue ones fire as soon as the wheel starts and their handler exists."""
+        data = await read_json(self.path, {}) or {}
+        self._current = int(time.time() // TICK)
+        for key, (kind, due, payload) in data.get("timers", {}).items():
+            self._unlink(key)
+            timer = self._timers[key] = Timer(key, kind, due, payload)
+            self._place(timer)
+        if self._timers:
+            logger.info(f"Restored {len(self._timers)} timer(s) from {self.path}.")
+
+    def start(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._tick())
+        self._wakeup.set()
+
+    def _changed(self):
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+            except RuntimeError:
+                pass  # no loop yet (load time); the next change or close() saves
+
+    async def _flush_later(self):
+        await asyncio.sleep(TIMER_FLUSH_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        saved = {**self._timers, **self._firing}
+        for waiting in self._waiting.values():
+            saved.update(waiting)
+        await write_json(self.path, {"version": 1, "timers": {key: timer.to_payload() for key, timer in saved.items()}})
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def report(self) -> Dict[str, int]:
+        return {"pending": len(self._timers), "firing": len(self._firing),
+                "waiting": sum(len(w) for w in self._waiting.values()), **self.stats}
+
+
+timers = TimerWheel()
@@ -0,0 +1,211 @@
+# tools/optimize_assets.py
+#
+# Build step for the images under assets/. Run it before deploying:
+#
+#   python tools/optimize_assets.py [--colors 128] [--budget "assets/pokemon/*.gif=2048"] [--check]
+#
+# - identical files are stored once (by sha256) and later copies point at the first
+# - GIFs are re-encoded with an optimized palette and Pillow's inter-frame
+#   cropping, PNG/JPEG/WEBP with their optimizing encoders; a result is only
+#   kept if it is smaller than the source
+# - a "small" variant (max SMALL_WIDTH px wide) is produced for each image
+# - assets/manifest.json maps every source path to the file to serve, which
+#   assets.AssetCache reads at runtime
+#
+# A per-asset size report is printed, and the exit status is 1 if any served
+# file is over its budget. Pillow is optional: without it files are only
+# deduplicated, reported and checked against budgets.
+
+import os
+import sys
+import shutil
+import fnmatch
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import dumps  # noqa: E402
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:  # optional dependency
+    Image = None
+
+ASSET_ROOT = "assets"
+BUILD_DIR = "assets/build"
+MANIFEST_FILE = "assets/manifest.json"
+IMAGE_EXTENSIONS = (".gif", ".png", ".jpg", ".jpeg", ".webp", ".avif")
+SMALL_WIDTH = 256
+# KB per served file; the first matching pattern wins
+DEFAULT_BUDGETS: List[Tuple[str, int]] = [
+    ("*.gif", 2560),
+    ("*", 1024),
+]
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_assets(root: str) -> List[str]:
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if os.path.join(dirpath, d) != os.path.normpath(BUILD_DIR))
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.join(dirpath, name).replace(os.sep, "/"))
+    return found
+
+
+def _save_frames(frames, out_path: str, fmt: str, info: dict, colors: int):
+    if fmt == "GIF":
+        if colors < 256:
+            frames = [frame.convert("RGB").quantize(colors=colors) for frame in frames]
+        durations = [frame.info.get("duration", info.get("duration", 100)) for frame in frames]
+        frames[0].save(
+            out_path, format="GIF", save_all=True, append_images=frames[1:], optimize=True,
+            loop=info.get("loop", 0), duration=durations, disposal=2,
+        )
+    elif fmt == "PNG":
+        frames[0].save(out_path, format="PNG", optimize=True)
+    elif fmt == "JPEG":
+        frames[0].convert("RGB").save(out_path, format="JPEG", quality=85, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        frames[0].save(out_path, format="WEBP", quality=80, method=6)
+    else:
+        raise ValueError(f"no encoder for {fmt}")
+
+
+def reencode(src: str, out_path: str, colors: int, max_width: Optional[int] = None) -> bool:
+    """Write an optimized copy of src (optionally resized). False if Pillow can't handle the format."""
+    try:
+        with Image.open(src) as im:
+            fmt = im.format
+            info = dict(im.info)
+            frames = [frame.copy() for frame in ImageSequence.Iterator(im)]
+    except (OSError, ValueError):
+        return False
+    if max_width and frames[0].width > max_width:
+        height = max(1, round(frames[0].height * max_width / frames[0].width))
+        frames = [frame.resize((max_width, height)) for frame in frames]
+    try:
+        _save_frames(frames, out_path, fmt, info, colors)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def built_name(path: str, digest: str, suffix: str = "") -> str:
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{BUILD_DIR}/{stem}{suffix}.{digest[:8]}{ext.lower()}"
+
+
+def budget_for(path: str, budgets: List[Tuple[str, int]]) -> int:
+    for pattern, kb in budgets:
+        if fnmatch.fnmatch(path, pattern):
+            return kb
+    return budgets[-1][1]
+
+
+def optimize(paths: List[str], colors: int, budgets: List[Tuple[str, int]], write: bool) -> Tuple[dict, List[str]]:
+    manifest: Dict[str, dict] = {}
+    first_by_hash: Dict[str, str] = {}
+    over_budget = []
+    if write and Image is not None:
+        os.makedirs(BUILD_DIR, exist_ok=True)
+
+    for path in paths:
+        digest = sha256_file(path)
+        source_bytes = os.path.getsize(path)
+        original = first_by_hash.setdefault(digest, path)
+        if original != path:
+            entry = dict(manifest[original], duplicate_of=original)
+            manifest[path] = entry
+        else:
+            entry = {"sha256": digest, "source_bytes": source_bytes, "file": path, "bytes": source_bytes, "variants": {}}
+            if write and Image is not None:
+                out = built_name(path, digest)
+                if reencode(path, out, colors) and os.path.getsize(out) < source_bytes:
+                    entry.update(file=out, bytes=os.path.getsize(out))
+                elif os.path.exists(out):
+                    os.remove(out)
+                small = built_name(path, digest, "-small")
+                if reencode(path, small, colors, max_width=SMALL_WIDTH) and os.path.getsize(small) < entry["bytes"]:
+                    entry["variants"]["small"] = {"file": small, "bytes": os.path.getsize(small)}
+                elif os.path.exists(small):
+                    os.remove(small)
+            manifest[path] = entry
+
+        budget = budget_for(path, budgets)
+        status = "ok"
+        if entry.get("duplicate_of"):
+            status = f"dup of {entry['duplicate_of']}"
+        elif entry["bytes"] > budget * 1024:
+            status = f"OVER {budget} KB"
+            over_budget.append(path)
+        saved = 100 * (1 - entry["bytes"] / source_bytes) if source_bytes else 0
+        print(f"{path:<90} {source_bytes / 1024:>9.1f} KB -> {entry['bytes'] / 1024:>9.1f} KB  {saved:>5.1f}%  {status}")
+    return manifest, over_budget
+
+
+def prune_build_dir(manifest: dict):
+    """Remove built files the new manifest no longer refers to."""
+    if not os.path.isdir(BUILD_DIR):
+        return
+    keep = set()
+    for entry in manifest.values():
+        keep.add(entry["file"])
+        keep.update(variant["file"] for variant in entry["variants"].values())
+    for name in os.listdir(BUILD_DIR):
+        path = f"{BUILD_DIR}/{name}"
+        if path not in keep:
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate and re-encode assets, write assets/manifest.json.")
+    parser.add_argument("--root", default=ASSET_ROOT)
+    parser.add_argument("--colors", type=int, default=256, help="GIF palette size (below 256 is lossy)")
+    parser.add_argument("--budget", action="append", default=[], metavar="GLOB=KB",
+                        help="size budget for matching served files, e.g. 'assets/pokemon/*.gif=2048'")
+    parser.add_argument("--check", action="store_true", help="only report and check budgets, write nothing")
+    parser.add_argument("--clean", action="store_true", help=f"remove {BUILD_DIR} first")
+    args = parser.parse_args()
+
+    budgets = [(glob, int(kb)) for glob, kb in (b.rsplit("=", 1) for b in args.budget)] + DEFAULT_BUDGETS
+    if args.clean and not args.check and os.path.isdir(BUILD_DIR):
+        shutil.rmtree(BUILD_DIR)
+    if Image is None:
+        print("Pillow not installed: deduplicating and checking budgets only (pip install Pillow to re-encode).")
+
+    paths = find_assets(args.root)
+    manifest, over_budget = optimize(paths, args.colors, budgets, write=not args.check)
+
+    unique = {entry["sha256"]: entry for entry in manifest.values()}
+    source_total = sum(entry["source_bytes"] for entry in unique.values())
+    served_total = sum(entry["bytes"] for entry in unique.values())
+    duplicates = len(manifest) - len(unique)
+    print(f"\n{len(manifest)} assets, {duplicates} duplicate(s); "
+          f"{source_total / 1024:.1f} KB -> {served_total / 1024:.1f} KB served")
+
+    if not args.check:
+        with open(MANIFEST_FILE, "wb") as f:
+            f.write(dumps({"version": 1, "assets": manifest}, pretty=True))
+        prune_build_dir(manifest)
+        print(f"Manifest written to {MANIFEST_FILE}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} asset(s) over budget:")
+        for path in over_budget:
+            print(f"  {path}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()